@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Import time and memory of the generated client (one method per RC2 function)
+compared to the compact client (table of RC2 functions, methods built on
+first use).
+
+Run from the repository root:
+    python benchmarks/bench_client.py
+
+"cold" imports compile the client, "warm" imports load the cached .pyc file.
+Memory is measured with tracemalloc after the import and after using two
+methods.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from context import limesurveyrc2parser as pkg
+
+REAL_SOURCE = os.path.join(os.path.dirname(__file__), "..", "tests",
+                           "resource", "lsrc2source.php")
+
+# imports the client in a fresh interpreter and uses two methods
+MEASURE = """
+import sys, time, tracemalloc
+import requests
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+del sys.modules["{module}"]
+tracemalloc.start()
+import {module}
+imported = tracemalloc.get_traced_memory()[0]
+client = {module}.LimeSurveyClient("http://localhost")
+client.get_session_key, client.list_surveys
+print(seconds, imported, tracemalloc.get_traced_memory()[0])
+"""
+
+
+def measure(directory, module, cold):
+    if cold:
+        shutil.rmtree(os.path.join(directory, "__pycache__"),
+                      ignore_errors=True)
+    output = subprocess.check_output(
+        [sys.executable, "-c", MEASURE.format(module=module)],
+        env=dict(os.environ, PYTHONPATH=directory))
+    seconds, imported, used = output.split()
+    return float(seconds), int(imported), int(used)
+
+
+def main():
+    parse_result = list(
+        pkg.LimeSurveyRc2PhpSourceParser.iter_parse(REAL_SOURCE))
+    directory = tempfile.mkdtemp()
+    print("%-15s %-5s %10s %14s %14s" % ("", "", "import", "after import",
+                                         "after use"))
+    for module, compact in (("full_client", False), ("compact_client", True)):
+        path = os.path.join(directory, module + ".py")
+        pkg.LimeSurveyRc2PythonSourceGenerator.generate_to(
+            path, parse_result, compact=compact)
+        for cold in (True, False):
+            if not cold:
+                # write the .pyc file
+                measure(directory, module, cold=False)
+            seconds, imported, used = min(measure(directory, module, cold)
+                                          for _ in range(10))
+            print("%-15s %-5s %7.2f ms %8d bytes %8d bytes" % (
+                module, "cold" if cold else "warm", seconds * 1e3, imported,
+                used))
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
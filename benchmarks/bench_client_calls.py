@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Calls per second of the generated client against a local stand-in server:
+a new connection per call (module level requests.post, as before) compared
+to the connection pool of the client.
+
+Run from the repository root:
+    python benchmarks/bench_client_calls.py
+"""
+import time
+from collections import OrderedDict
+import requests
+from context import limesurveyrc2parser
+from tests.stand_in import StandInServer, load_client_module
+
+CALLS = 500
+
+
+def main():
+    lsrc2client = load_client_module()
+    with StandInServer({"list_surveys": lambda key, user: []}) as server:
+        data = OrderedDict([("method", "list_surveys"),
+                            ("params", OrderedDict([("sSessionKey", "key"),
+                                                    ("sUser", None)])),
+                            ("id", 1)])
+        start = time.perf_counter()
+        for i in range(CALLS):
+            requests.post(server.url, json=data).json()
+        unpooled = CALLS / (time.perf_counter() - start)
+
+        with lsrc2client.LimeSurveyClient(server.url) as client:
+            start = time.perf_counter()
+            for i in range(CALLS):
+                client.list_surveys("key")
+            pooled = CALLS / (time.perf_counter() - start)
+
+    print("new connection per call: %8.0f calls/s" % unpooled)
+    print("connection pool:         %8.0f calls/s" % pooled)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Memory of the result of parsing 10k functions, __slots__ objects
+(FunctionDescription/Parameter) as returned by parse compared to the former
+nested dicts.
+
+Run from the repository root:
+    python benchmarks/bench_model.py
+"""
+import gc
+import tracemalloc
+from context import limesurveyrc2parser as pkg
+from bench_parser import synthetic_source
+
+N = 10000
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    php_source = synthetic_source(N)
+    Parser = pkg.LimeSurveyRc2PhpSourceParser
+
+    def build_dicts():
+        return [f.to_dict() for f in Parser.parse(php_source)]
+
+    def build_objects():
+        return Parser.parse(php_source)
+
+    # both include the strings (doc, names) of the result
+    _, dict_bytes = measure(build_dicts)
+    _, object_bytes = measure(build_objects)
+    print("functions:       %d" % N)
+    print("dicts:           %10d bytes" % dict_bytes)
+    print("__slots__:       %10d bytes" % object_bytes)
+    print("ratio:           %10.2f" % (float(object_bytes) / dict_bytes))
+
+
+if __name__ == "__main__":
+    main()
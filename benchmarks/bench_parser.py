@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of LimeSurveyRc2PhpSourceParser.parse on synthetic PHP sources of
+growing size.
+
+Run from the repository root:
+    python benchmarks/bench_parser.py
+
+For every size the time per KB of source is printed. For the single pass
+scanner it stays constant (linear cost), for the former RegEx scan it grows
+with the number of doc comments that are not followed by a public function.
+"""
+import timeit
+from context import limesurveyrc2parser as pkg
+
+Parser = pkg.LimeSurveyRc2PhpSourceParser
+
+FUNCTION = """
+    /**
+    * Documentation of function_%(i)d
+    *
+    * @access public
+    * @param string $sSessionKey Auth credentials
+    * @param int $iSurveyID ID of the survey
+    * @return array
+    */
+    public function function_%(i)d($sSessionKey, $iSurveyID, $aOptions=Array())
+    {
+        return array('status' => 'OK');
+    }
+"""
+
+# doc comments without a following public function make the RegEx retry the
+# lazy doc match from every "/**" up to the end of the source
+PROPERTY = """
+    /**
+    * Documentation of property_%(i)d
+    */
+    protected $property_%(i)d;
+"""
+
+
+def synthetic_source(n, template=FUNCTION):
+    return "<?php\nclass remotecontrol_handle\n{\n%s}\n" % "".join(
+        template % {"i": i} for i in range(n))
+
+
+def scan(php_source):
+    return list(Parser.scan(php_source))
+
+
+def scan_re(php_source):
+    """
+    The former RegEx scan, kept as reference.
+    """
+    return Parser.RE_DOC_PUBLIC_FUNCTION_PARAM.findall(php_source)
+
+
+def bench(label, parse, php_source, number=3):
+    seconds = min(timeit.repeat(lambda: parse(php_source),
+                                number=1, repeat=number))
+    kb = len(php_source) / 1024.0
+    print("%-8s %10.1f KB %10.4f s %10.2f us/KB" %
+          (label, kb, seconds, seconds / kb * 1e6))
+
+
+def main():
+    for n in (500, 1000, 2000, 4000):
+        php_source = synthetic_source(n)
+        bench("parse", Parser.parse, php_source)
+        bench("scan", scan, php_source)
+        bench("re", scan_re, php_source)
+
+    print("\nDoc comments without public function:")
+    for n in (250, 500, 1000, 2000):
+        php_source = synthetic_source(n, PROPERTY)
+        bench("scan", scan, php_source)
+        bench("re", scan_re, php_source)
+
+
+if __name__ == "__main__":
+    main()
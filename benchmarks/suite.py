@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite of parser and generator on the real PHP source, synthetic
+controllers and adversarial inputs.
+
+Run from the repository root:
+    python benchmarks/suite.py [--sizes 1000,10000,100000] [--output out.json]
+        [--baseline previous.json --max-slowdown 1.5]
+
+The results are printed as a table and can be written as JSON. Given a
+baseline written by an earlier run, the exit code is 1 if any benchmark got
+slower than max-slowdown times the baseline.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import timeit
+from context import limesurveyrc2parser as pkg
+from bench_parser import synthetic_source, PROPERTY
+
+Parser = pkg.LimeSurveyRc2PhpSourceParser
+SourceGenerator = pkg.LimeSurveyRc2PythonSourceGenerator
+
+REAL_SOURCE = os.path.join(os.path.dirname(__file__), "..", "tests",
+                           "resource", "lsrc2source.php")
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def huge_doc(lines):
+    return "\n".join("    * line %d of a huge doc comment /* with */ noise" % i
+                     for i in range(lines))
+
+
+def nested_signature(parameters):
+    return ", ".join("$aParam%d=array(array(%d, 'a)b'), array())" % (i, i)
+                     for i in range(parameters))
+
+
+def documented_parameters(parameters):
+    """
+    :return: doc and parameters with every parameter documented and named
+       in the free text
+    """
+    doc = "Function with %d parameters\n" % parameters + "\n".join(
+        "@param string $sParam%d description of $sParam%d" % (i, i)
+        for i in range(parameters)) + "\n@access public\n@return array"
+    return doc, Parser.extract_parameters(
+        ", ".join("$sParam%d" % i for i in range(parameters)), doc)
+
+
+def get_cases(sizes):
+    """
+    :return: list of tuples (name, size, unit, function, argument)
+    """
+    with open(REAL_SOURCE) as f:
+        real_source = f.read()
+    real_result = Parser.parse(real_source)
+    cases = [
+        ("parse/real", len(real_result), "functions", Parser.parse,
+         real_source),
+        ("generate/real", len(real_result), "functions",
+         SourceGenerator.generate, real_result),
+    ]
+    for size in sizes:
+        php_source = synthetic_source(size)
+        cases += [
+            ("parse/synthetic", size, "functions", Parser.parse, php_source),
+            ("generate/synthetic", size, "functions",
+             SourceGenerator.generate, Parser.parse(php_source)),
+            # doc comments that are not followed by a public function
+            ("parse/orphan_docs", size, "docs", Parser.parse,
+             synthetic_source(size, PROPERTY)),
+            # unterminated doc comment at the end of the source
+            ("parse/unterminated_doc", size, "functions", Parser.parse,
+             php_source + "\n    /**\n" + huge_doc(size)),
+            # doc comment without "*/" at all
+            ("parse/unterminated_doc_only", size, "lines", Parser.parse,
+             "<?php\n/**\n" + huge_doc(size) +
+             "\npublic function f($a)\n"),
+        ]
+    for size in sizes[:2]:
+        doc = "/**\n" + huge_doc(size) + "\n    */"
+        doc_parameters = documented_parameters(size // 10)
+        cases += [
+            ("clean_doc/huge_doc", size, "lines", Parser.clean_doc, doc),
+            ("parse/huge_doc", size, "lines", Parser.parse,
+             "<?php\n" + doc + "\npublic function f($iA)\n{\n}\n"),
+            ("extract_parameters/nested_defaults", size // 10, "parameters",
+             Parser.extract_parameters, nested_signature(size // 10)),
+            ("parse/nested_defaults", size // 10, "parameters", Parser.parse,
+             "<?php\n/**\n* doc\n*/\npublic function f(%s)\n{\n}\n" %
+             nested_signature(size // 10)),
+            ("get_fct_doc/documented_parameters", len(doc_parameters[1]),
+             "parameters", lambda args: SourceGenerator.get_fct_doc(*args),
+             doc_parameters),
+        ]
+    return cases
+
+
+def run(cases, repeat):
+    results = []
+    for name, size, unit, function, argument in cases:
+        # large inputs are measured once
+        number = repeat if size <= 10000 else 1
+        # the parser prints warnings for adversarial inputs
+        with open(os.devnull, mode="w") as devnull, \
+                contextlib.redirect_stdout(devnull):
+            seconds = min(timeit.repeat(lambda: function(argument),
+                                        number=1, repeat=number))
+        result = {
+            "name": name,
+            "size": size,
+            "unit": unit,
+            "seconds": seconds,
+            "seconds_per_unit": seconds / max(size, 1),
+        }
+        results.append(result)
+        print("%-36s %8d %-10s %10.4f s %10.2f us/%s" % (
+            name, size, unit, seconds, result["seconds_per_unit"] * 1e6,
+            unit.rstrip("s")))
+        sys.stdout.flush()
+    return results
+
+
+def compare(results, baseline, max_slowdown):
+    """
+    :return: list of messages for the benchmarks slower than max_slowdown
+       times the baseline
+    """
+    previous = dict(((r["name"], r["size"]), r["seconds"])
+                    for r in baseline["results"])
+    regressions = []
+    for r in results:
+        key = (r["name"], r["size"])
+        if key in previous and r["seconds"] > previous[key] * max_slowdown:
+            regressions.append("%s (%d %s): %.4f s, baseline %.4f s" % (
+                r["name"], r["size"], r["unit"], r["seconds"],
+                previous[key]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default=",".join(
+        str(size) for size in DEFAULT_SIZES),
+        help="comma separated sizes of the synthetic inputs")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="repetitions, the fastest one is reported")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results of an earlier run")
+    parser.add_argument("--max-slowdown", type=float, default=1.5,
+                        help="allowed slowdown compared to the baseline")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = run(get_cases(sizes), args.repeat)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, mode="w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_slowdown)
+        for regression in regressions:
+            print("REGRESSION %s" % regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
 from .parser import LimeSurveyRc2PhpSourceParser
 from .python_generator import LimeSurveyRc2PythonSourceGenerator
+from .docblock import PhpDocBlock
+from .cache import ParseCache
+from .compat import LimeSurveyRc2CompatibilityMatrix
+from .model import FunctionDescription, Parameter
 
 __version__ = "0.1"
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import tempfile
+
+
+class ParseCache(object):
+    """
+    On-disk cache for parsed function descriptions and generated method
+    sources.
+
+    Entries are keyed by the hash of a function's doc comment and signature
+    (see LimeSurveyRc2PhpSourceParser.get_source_hash) and stored as one JSON
+    file per function. The hash is combined with a namespace, which defaults
+    to a hash of the package sources, so entries written by another version of
+    the parser or generator are never used. If the cache grows beyond
+    max_size bytes, the least recently used entries are evicted.
+    """
+
+    # default maximum size of the cache directory in bytes
+    MAX_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, directory, max_size=MAX_SIZE, namespace=None):
+        """
+        :param directory: cache directory, created if it doesn't exist
+        :param max_size: maximum size of all entries in bytes
+        :param namespace: string combined with every key, defaults to
+           get_default_namespace()
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.namespace = namespace if namespace is not None else \
+            self.get_default_namespace()
+        self.hits = 0
+        self.misses = 0
+        # entries read or written during this run: key -> entry
+        self.entries = {}
+        # files in the cache directory: file name -> [size, last use]
+        self.index = {}
+        os.makedirs(directory, exist_ok=True)
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".json") and entry.is_file():
+                stat = entry.stat()
+                self.index[entry.name] = [stat.st_size, stat.st_mtime]
+        self.size = sum(size for size, _ in self.index.values())
+
+    @staticmethod
+    def get_default_namespace():
+        """
+        :return: hash of the sources of this package (including the template)
+        """
+        package_dir = os.path.dirname(__file__)
+        sha = hashlib.sha1()
+        for directory in (package_dir, os.path.join(package_dir, "template")):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(".py"):
+                    with open(os.path.join(directory, name), mode="rb") as f:
+                        sha.update(name.encode("utf-8") + b"\0" + f.read())
+        return sha.hexdigest()
+
+    def get_file_name(self, key):
+        return hashlib.sha1(
+            (self.namespace + "\0" + key).encode("utf-8")).hexdigest() + ".json"
+
+    def get(self, key, field):
+        """
+        :param key: hash of the function source
+        :param field: "description" or "method"
+        :return: cached value or None
+        """
+        entry = self.load(key)
+        if entry is None or field not in entry:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[field]
+
+    def set(self, key, field, value):
+        """
+        Stores a JSON serializable value for a function and evicts least
+        recently used entries if the cache grows beyond max_size.
+        :param key: hash of the function source
+        :param field: "description" or "method"
+        :param value: value to store
+        """
+        entry = self.load(key) or {}
+        entry[field] = value
+        self.entries[key] = entry
+        file_name = self.get_file_name(key)
+        data = json.dumps(entry).encode("utf-8")
+        # write to a temporary file first, parallel runs may share the cache
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, mode="wb") as f:
+            f.write(data)
+        os.replace(tmp_path, os.path.join(self.directory, file_name))
+
+        old_size = self.index.get(file_name, [0])[0]
+        self.index[file_name] = [len(data), os.path.getmtime(
+            os.path.join(self.directory, file_name))]
+        self.size += len(data) - old_size
+        if self.size > self.max_size:
+            self.evict()
+
+    def load(self, key):
+        if key in self.entries:
+            return self.entries[key]
+        file_name = self.get_file_name(key)
+        if file_name not in self.index:
+            return None
+        path = os.path.join(self.directory, file_name)
+        try:
+            with open(path, mode="rb") as f:
+                entry = json.loads(f.read().decode("utf-8"))
+            # mark the entry as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            # evicted by a parallel run or not written completely
+            return None
+        self.index[file_name][1] = os.path.getmtime(path)
+        self.entries[key] = entry
+        return entry
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache has shrunk to 3/4
+        of max_size, so that eviction doesn't run on every following set.
+        """
+        target = self.max_size * 3 // 4
+        by_last_use = sorted(self.index.items(), key=lambda item: item[1][1])
+        for file_name, (size, _) in by_last_use:
+            if self.size <= target:
+                break
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except OSError:
+                pass
+            del self.index[file_name]
+            self.size -= size
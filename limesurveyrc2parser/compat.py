@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .parser import LimeSurveyRc2PhpSourceParser
+
+
+def get_signatures(parse_result):
+    """
+    :param parse_result: result of the parser invocation
+    :return: list of tuples (name, parameters) with parameters being a list
+       of tuples (py_name, php_name, has_default, default)
+    """
+    return [
+        (fct_desc["name"],
+         [(p["py_name"], p["name"], "default" in p, p.get("default"))
+          for p in fct_desc["parameters"]])
+        for fct_desc in parse_result]
+
+
+def parse_signatures(path):
+    """
+    Parses a PHP file and returns only what the compatibility matrix needs,
+    so that little data has to be sent back from a worker process.
+    :param path: path of the PHP file
+    :return: signatures, see get_signatures
+    """
+    return get_signatures(LimeSurveyRc2PhpSourceParser.iter_parse(path))
+
+
+class LimeSurveyRc2CompatibilityMatrix(object):
+    """
+    Shows which RC2 methods and parameters exist in which version of the PHP
+    source, and how parameter order and defaults changed between versions.
+    Parameters are identified by their Python name.
+    """
+
+    def __init__(self, versions=None):
+        """
+        :param versions: labels of the versions in chronological order.
+           Versions added later are appended.
+        """
+        self.versions = list(versions or [])
+        # method name -> version -> list of parameter tuples, see
+        # get_signatures
+        self.methods = {}
+
+    @classmethod
+    def from_files(cls, paths, labels=None, workers=None):
+        """
+        Parses the PHP files in a process pool and merges every result as
+        soon as its worker finishes.
+        :param paths: paths of the PHP files in chronological order
+        :param labels: version labels for the paths, defaults to the paths
+        :param workers: number of worker processes, defaults to the number
+           of CPUs
+        :return: LimeSurveyRc2CompatibilityMatrix
+        """
+        labels = list(labels or paths)
+        matrix = cls(labels)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = dict(
+                (executor.submit(parse_signatures, path), label)
+                for path, label in zip(paths, labels))
+            for future in as_completed(futures):
+                matrix.add_signatures(futures[future], future.result())
+        return matrix
+
+    def add(self, version, parse_result):
+        """
+        :param version: version label
+        :param parse_result: result of the parser invocation
+        """
+        self.add_signatures(version, get_signatures(parse_result))
+
+    def add_signatures(self, version, signatures):
+        """
+        :param version: version label
+        :param signatures: signatures, see get_signatures
+        """
+        if version not in self.versions:
+            self.versions.append(version)
+        for name, parameters in signatures:
+            self.methods.setdefault(name, {})[version] = parameters
+
+    def get_method_names(self):
+        return sorted(self.methods)
+
+    def get_changes(self):
+        """
+        Compares every version with the previous version containing the
+        method.
+        :return: list of dicts with keys "method", "change", "version",
+           "previous_version" and, depending on the change, "parameter",
+           "previous" and "current". change is one of "method_added",
+           "method_removed", "parameter_added", "parameter_removed",
+           "default_changed" and "order_changed".
+        """
+        changes = []
+        for name in self.get_method_names():
+            by_version = self.methods[name]
+            previous_version = None
+            for version in self.versions:
+                if version not in by_version:
+                    if previous_version is not None:
+                        changes.append(OrderedDict([
+                            ("method", name),
+                            ("change", "method_removed"),
+                            ("version", version),
+                            ("previous_version", previous_version)]))
+                        previous_version = None
+                    continue
+                if previous_version is None:
+                    if version != self.versions[0]:
+                        changes.append(OrderedDict([
+                            ("method", name),
+                            ("change", "method_added"),
+                            ("version", version),
+                            ("previous_version", None)]))
+                else:
+                    changes.extend(self.get_parameter_changes(
+                        name, previous_version, by_version[previous_version],
+                        version, by_version[version]))
+                previous_version = version
+        return changes
+
+    @staticmethod
+    def get_parameter_changes(name, previous_version, previous, version,
+                              current):
+        changes = []
+
+        def change(kind, parameter, previous_value=None, current_value=None):
+            changes.append(OrderedDict([
+                ("method", name),
+                ("change", kind),
+                ("version", version),
+                ("previous_version", previous_version),
+                ("parameter", parameter),
+                ("previous", previous_value),
+                ("current", current_value)]))
+
+        previous_by_name = dict((p[0], p) for p in previous)
+        current_by_name = dict((p[0], p) for p in current)
+        for p in current:
+            if p[0] not in previous_by_name:
+                change("parameter_added", p[0], current_value=p[1])
+        for p in previous:
+            if p[0] not in current_by_name:
+                change("parameter_removed", p[0], previous_value=p[1])
+                continue
+            c = current_by_name[p[0]]
+            if p[2:] != c[2:]:
+                change("default_changed", p[0],
+                       p[3] if p[2] else None, c[3] if c[2] else None)
+
+        previous_order = [p[0] for p in previous if p[0] in current_by_name]
+        current_order = [p[0] for p in current if p[0] in previous_by_name]
+        if previous_order != current_order:
+            change("order_changed", None, previous_order, current_order)
+        return changes
+
+    def to_dict(self):
+        """
+        :return: dict with keys "versions", "methods" and "changes". methods
+           maps every method name to the versions containing it and its
+           parameters to the versions containing them.
+        """
+        methods = OrderedDict()
+        for name in self.get_method_names():
+            by_version = self.methods[name]
+            parameters = OrderedDict()
+            for version in self.versions:
+                for p in by_version.get(version, []):
+                    parameters.setdefault(p[0], []).append(version)
+            methods[name] = OrderedDict([
+                ("versions", [v for v in self.versions if v in by_version]),
+                ("parameters", parameters)])
+        return OrderedDict([
+            ("versions", list(self.versions)),
+            ("methods", methods),
+            ("changes", self.get_changes())])
+
+    def to_text(self):
+        """
+        :return: matrix with one row per method and one column per version
+           as text. "x" marks a version containing the method.
+        """
+        width = max([len(name) for name in self.methods] + [6])
+        lines = [" " * width + " " + " ".join(
+            "%d" % (i + 1) for i in range(len(self.versions)))]
+        for name in self.get_method_names():
+            lines.append(name.ljust(width) + " " + " ".join(
+                ("x" if version in self.methods[name] else "-").ljust(
+                    len("%d" % (i + 1)))
+                for i, version in enumerate(self.versions)))
+        lines.append("")
+        lines += ["%d: %s" % (i + 1, version)
+                  for i, version in enumerate(self.versions)]
+        return "\n".join(lines)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import re
+from collections import OrderedDict
+
+
+class PhpDocBlock(object):
+    """
+    Structured model of a (cleaned) PHP doc comment.
+
+    The doc is parsed once, line by line, into the @param entries keyed by
+    PHP variable name, the @return and @access tags and the free text, so
+    that parser and generator don't have to search the doc again for every
+    parameter.
+    """
+
+    # RE to match a tag line, e.g. "@param string $sSessionKey Auth"
+    RE_TAG = re.compile("@(\\w+)(.*)")
+
+    # RE to split the value of a @param tag into type, name and description
+    RE_PARAM = re.compile(" (\\S*) (\\S+)(.*)")
+
+    def __init__(self, lines):
+        """
+        :param lines: lines of the cleaned doc
+        """
+        self.lines = lines
+        # PHP variable name -> dict with keys "type", "description", "line"
+        self.params = OrderedDict()
+        # dict with keys "type", "description", "line" or None
+        self.returns = None
+        self.access = None
+        # tag -> list of indexes of the lines starting with the tag
+        self.tag_lines = {}
+        text = []
+        for i, line in enumerate(lines):
+            m = self.RE_TAG.match(line)
+            if not m:
+                text.append(line)
+                continue
+            tag, value = m.group(1), m.group(2)
+            self.tag_lines.setdefault(tag, []).append(i)
+            if tag == "param":
+                param_match = self.RE_PARAM.match(value)
+                if param_match and param_match.group(2) not in self.params:
+                    self.params[param_match.group(2)] = {
+                        "type": param_match.group(1),
+                        "description": param_match.group(3).strip(),
+                        "line": i
+                    }
+            elif tag == "return" and self.returns is None:
+                typ, _, description = value.strip().partition(" ")
+                self.returns = {
+                    "type": typ,
+                    "description": description.strip(),
+                    "line": i
+                }
+            elif tag == "access" and self.access is None:
+                self.access = value.strip()
+        self.text = "\n".join(text).strip()
+
+    @classmethod
+    def parse(cls, doc):
+        """
+        :param doc: cleaned doc, see LimeSurveyRc2PhpSourceParser.clean_doc
+        :return: PhpDocBlock
+        """
+        return cls(doc.split("\n"))
+
+    def get_param_type(self, php_variable):
+        """
+        :param php_variable: e.g. $sSessionKey
+        :return: documented type, e.g. "string", or None if not documented
+        """
+        param = self.params.get(php_variable)
+        return param["type"] if param else None
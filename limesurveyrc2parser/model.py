@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+import sys
+from .docblock import PhpDocBlock
+
+# marks a parameter without default value (None is a valid default)
+MISSING = object()
+
+
+class DictAccessMixin(object):
+    """
+    Read-only dict-like access to the attributes named in KEYS, so that parse
+    results can be used like the dicts returned by former versions.
+    Attributes that are MISSING, or None unless named in NULLABLE_KEYS, are
+    treated as missing keys.
+    """
+    __slots__ = ()
+
+    KEYS = ()
+
+    NULLABLE_KEYS = ()
+
+    def __getitem__(self, key):
+        value = getattr(self, key, MISSING) if key in self.KEYS else MISSING
+        if value is MISSING or \
+                (value is None and key not in self.NULLABLE_KEYS):
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return [key for key in self.KEYS if key in self]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def __eq__(self, other):
+        if isinstance(other, DictAccessMixin):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.to_dict())
+
+
+class Parameter(DictAccessMixin):
+    """
+    Parameter of a RC2 function, see
+    LimeSurveyRc2PhpSourceParser.extract_parameters
+    """
+    __slots__ = ("name", "py_name", "type", "default")
+
+    KEYS = ("name", "py_name", "type", "default")
+
+    # "type" is None if unknown, like in the dicts of former versions
+    NULLABLE_KEYS = ("type", "default")
+
+    def __init__(self, name, py_name, type=None, default=MISSING):
+        """
+        :param name: PHP name, e.g. "$sSessionKey"
+        :param py_name: Python name, e.g. "session_key"
+        :param type: type character, e.g. "s", or None if unknown
+        :param default: Python default value or MISSING
+        """
+        self.name = sys.intern(name)
+        self.py_name = sys.intern(py_name)
+        self.type = sys.intern(type) if type is not None else None
+        self.default = default
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["name"], d["py_name"], d.get("type"),
+                   d.get("default", MISSING))
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+class FunctionDescription(DictAccessMixin):
+    """
+    Public function of the RC2 API, see
+    LimeSurveyRc2PhpSourceParser.get_function_description
+    """
+    __slots__ = ("name", "parameters", "doc", "hash")
+
+    KEYS = ("name", "parameters", "doc", "docblock", "hash")
+
+    def __init__(self, name, parameters, doc, hash=None):
+        """
+        :param name: function name
+        :param parameters: list of Parameter
+        :param doc: cleaned doc
+        :param hash: hash of the function source or None
+        """
+        self.name = sys.intern(name)
+        self.parameters = parameters
+        self.doc = doc
+        self.hash = hash
+
+    @property
+    def docblock(self):
+        """
+        PhpDocBlock of the doc. It is parsed on every access and not kept,
+        as it would take several times the memory of the description.
+        """
+        return PhpDocBlock.parse(self.doc)
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["name"],
+                   [Parameter.from_dict(p) for p in d["parameters"]],
+                   d["doc"], d.get("hash"))
+
+    def to_dict(self):
+        """
+        :return: dict with keys "name", "parameters" (list of dicts), "doc"
+           and "hash". The docblock is left out, so the dict can be
+           serialized as JSON.
+        """
+        d = dict((key, value) for key, value in self.items()
+                 if key != "docblock")
+        d["parameters"] = [p.to_dict() for p in self.parameters]
+        return d
@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
+import codecs
+import hashlib
+import io
 import re
 import pydash
+from .docblock import PhpDocBlock
+from .model import FunctionDescription, Parameter
+from .scanner import PhpSourceScanner
 
 
 class LimeSurveyRc2PhpSourceParser(object):
@@ -16,39 +22,114 @@ class LimeSurveyRc2PhpSourceParser(object):
         \((.+?)\)$                   # parameters
         """, re.MULTILINE | re.VERBOSE | re.DOTALL)
 
-    # simpler RE without doc string for validation purposes
-    RE_PUBLIC_FUNCTION_PARAM = re.compile("""
-        public\ function\ ([^(]+)  # function name
-        \(([^)]+)\)                # parameters
-        """, re.MULTILINE | re.VERBOSE)
+    # number of characters/bytes read at once by iter_parse
+    CHUNK_SIZE = 64 * 1024
 
     # RE to match PHP signature
     RE_SIGNATURE_PARAMETER = re.compile("([^=]+)\s*(=\s*(.+))?")
 
     @classmethod
-    def parse(cls, php_source):
+    def parse(cls, php_source, cache=None):
         """
         Extracts public functions with JS doc text and signature
         :param php_source: php sources
-        :return: List of dicts with keys: "name", "doc", "parameters" with
-           parameters being dicts with keys "name", "type", "default" (optional)
+        :param cache: optional ParseCache. Functions found in the cache are
+           not parsed again.
+        :return: List of FunctionDescription, which can be accessed like
+           dicts with keys: "name", "doc", "docblock", "hash", "parameters"
+           with parameters being Parameter (dict-like with keys "name",
+           "py_name", "type" (None if unknown), "default" (optional)). The
+           "docblock" is parsed from the doc on access.
+        """
+        return list(cls.get_function_descriptions(cls.scan(php_source),
+                                                  cache))
+
+    @classmethod
+    def iter_parse(cls, source, chunk_size=CHUNK_SIZE, cache=None):
+        """
+        Like parse, but reads the PHP source in chunks and yields every
+        function description as soon as it is complete. Only the function
+        being scanned is kept in memory, not the whole source.
+        :param source: path of the PHP file or file object opened in text or
+           binary mode (e.g. also a mmap.mmap). Binary data is decoded as
+           UTF-8 with universal newlines.
+        :param chunk_size: number of characters/bytes to read at once
+        :param cache: optional ParseCache, see parse
+        :return: generator of FunctionDescription as returned by parse
+        """
+        if not hasattr(source, "read"):
+            with open(source, mode="rb") as f:
+                for function_description in cls.iter_parse(f, chunk_size,
+                                                           cache):
+                    yield function_description
+            return
+
+        decoder = None
+        scanner = PhpSourceScanner()
+        while True:
+            chunk = source.read(chunk_size)
+            final = not chunk
+            if isinstance(chunk, bytes):
+                if decoder is None:
+                    decoder = io.IncrementalNewlineDecoder(
+                        codecs.getincrementaldecoder("utf-8")(),
+                        translate=True)
+                chunk = decoder.decode(chunk, final=final)
+            for function_description in cls.get_function_descriptions(
+                    scanner.feed(chunk, final), cache):
+                yield function_description
+            if final:
+                return
+
+    @staticmethod
+    def scan(php_source):
+        """
+        Scans the PHP source in a single pass, see PhpSourceScanner.
+
+        Yields the same doc, name and signature as
+        RE_DOC_PUBLIC_FUNCTION_PARAM, but public functions without a doc
+        comment are yielded as well.
+        :param php_source: php sources
+        :return: list of tuples (doc, name, signature) with doc being None
+           if the function has no doc comment
         """
-        # Extract function names and parameters
-        func_params = cls.RE_PUBLIC_FUNCTION_PARAM.findall(php_source)
-        # Extract extended version with additional doc
-        doc_func_params = cls.RE_DOC_PUBLIC_FUNCTION_PARAM.findall(php_source)
-
-        # Check if there is a doc found for every function name/params
-        if len(func_params) > len(doc_func_params):
-            function_names_with_doc = [t[1] for t in doc_func_params]
-            for f in func_params:
-                if f[0] not in function_names_with_doc:
-                    print("Missing function in doc: %s" % f[0])
-
-        return [LimeSurveyRc2PhpSourceParser.get_function_description(f) for f
-                in doc_func_params
-                if f[1] != "__construct"]
-        # with comments 39 results -> because / in comment
+        return PhpSourceScanner().feed(php_source, final=True)
+
+    @classmethod
+    def get_function_descriptions(cls, scan_result, cache=None):
+        """
+        :param scan_result: tuples (doc, name, signature) as returned by scan
+        :param cache: optional ParseCache, see parse
+        :return: generator of function descriptions of the documented
+           functions except the constructor
+        """
+        for doc, name, signature in scan_result:
+            if doc is None:
+                print("Missing function in doc: %s" % name)
+            elif name == "__construct":
+                pass
+            elif cache is None:
+                yield cls.get_function_description((doc, name, signature))
+            else:
+                key = cls.get_source_hash(doc, name, signature)
+                cached = cache.get(key, "description")
+                if cached is None:
+                    function_description = cls.get_function_description(
+                        (doc, name, signature))
+                    cache.set(key, "description",
+                              function_description.to_dict())
+                else:
+                    function_description = \
+                        FunctionDescription.from_dict(cached)
+                yield function_description
+
+    @staticmethod
+    def get_source_hash(doc, name, signature):
+        """
+        :return: hash of the doc comment, name and signature of a function
+        """
+        return hashlib.sha1("\0".join((doc, name, signature)).encode(
+            "utf-8")).hexdigest()
 
     @classmethod
     def get_function_description(cls, doc_func_param_match_result):
@@ -62,21 +143,21 @@ class LimeSurveyRc2PhpSourceParser(object):
 
         doc = cls.clean_doc(match_doc)
 
-        return {
-            "name": match_name,
-            # doc is provided to extract parameters to determine the type
+        return FunctionDescription(
+            match_name,
+            # docblock is provided to extract parameters to determine the type
             # based on the documentation (if no hungarian type notation is
             # given)
-            "parameters": cls.extract_parameters(match_signature, doc),
-            "doc": doc
-        }
+            cls.extract_parameters(match_signature, PhpDocBlock.parse(doc)),
+            doc,
+            cls.get_source_hash(match_doc, match_name, match_signature))
 
     @classmethod
     def extract_parameters(cls, php_signature, doc=""):
         """
         converts a PHP signature, e.g.
         "$sSessionKey, $iSurveyID,  $docType='pdf'
-        to a list of dicts
+        to a list of Parameter (accessible like the dicts)
         [{
           "name": "$sSessionKey",
           "py_name": "session_key",
@@ -91,9 +172,11 @@ class LimeSurveyRc2PhpSourceParser(object):
           "default": "pdf"
         }
         :param php_signature: PHP signature
-        :param doc: PHP documentation
-        :return: list of dicts as described
+        :param doc: PHP documentation (string or PhpDocBlock)
+        :return: list of Parameter as described
         """
+        if not isinstance(doc, PhpDocBlock):
+            doc = PhpDocBlock.parse(doc)
         php_parameters = [p.strip() for p in php_signature.split(",")]
         result = []
         for php_parameter in php_parameters:
@@ -107,7 +190,7 @@ class LimeSurveyRc2PhpSourceParser(object):
             if default is not None:
                 details['default'] = cls.get_py_default_from_php_default(
                     default, details.get("type", None))
-            result.append(details)
+            result.append(Parameter.from_dict(details))
         return result
 
     @classmethod
@@ -117,7 +200,7 @@ class LimeSurveyRc2PhpSourceParser(object):
         dict.
 
         :param php_variable: e.g. $sSessionKey
-        :param doc: PHP documentation
+        :param doc: PHP documentation (string or PhpDocBlock)
         :return: e.g. {
           "name": "$sSessionKey",
           "type": "s"
@@ -136,8 +219,8 @@ class LimeSurveyRc2PhpSourceParser(object):
                 "type": typ
             }
         else:
-            doc_match = re.search(
-                "@param (\S*) " + php_variable.replace("$", "\\$"), doc)
+            if not isinstance(doc, PhpDocBlock):
+                doc = PhpDocBlock.parse(doc)
             php_doc_type2char = {
                 "string": "s",
                 "int": "i",
@@ -149,7 +232,7 @@ class LimeSurveyRc2PhpSourceParser(object):
                 "name": php_variable,
                 "py_name": cls.get_py_name_from_php_name_stripped(
                     php_variable_stripped),
-                "type": php_doc_type2char.get(doc_match and doc_match[1])
+                "type": php_doc_type2char.get(doc.get_param_type(php_variable))
             }
 
     @staticmethod
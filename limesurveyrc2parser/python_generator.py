@@ -1,5 +1,10 @@
 # -*- coding: utf-8 -*-
+import base64
+import io
 import os
+import re
+import zlib
+from .docblock import PhpDocBlock
 
 
 class LimeSurveyRc2PythonSourceGenerator(object):
@@ -7,44 +12,315 @@ class LimeSurveyRc2PythonSourceGenerator(object):
     Generates Python client for the RC2 API methods.
     """
 
+    # PHP doc types of a @param that are reformatted for a parameter type
+    TYPE2PHP_TYPE_STR = {
+        "i": ["integer", "int"],
+        "b": ["bool"],
+        "s": ["string", "string|null"],
+        "a": ["array", "struct", "array|null", "array|struct"],
+        "d": ["string"]
+    }
+
+    TYPE2PY_TYPE_STR = {
+        "i": "Integer",
+        "b": "Boolean",
+        "s": "String",
+        "a": "OrderedDict",
+        "d": "Date(as String ?)"
+    }
+
+    # prefixes of the names of RC2 methods which only read data and of
+    # methods which change data, see get_method_kind
+    READ_PREFIXES = ("get_", "list_")
+    WRITE_PREFIXES = ("set_", "add_", "delete_", "import_", "activate_",
+                      "copy_", "update_", "invite_", "remind_", "mail_",
+                      "cpd_import")
+    # methods with a read prefix which have side effects
+    NOT_READ_METHODS = ("get_session_key",)
+
+    # Methods of the compact client: the methods of the RC2 functions are
+    # built from the _RC2_FUNCTIONS table on first use (compiling a one line
+    # function is cheap and keeps the signature).
+    COMPACT_METHODS = '''
+    def __getattr__(self, name):
+        """
+        Builds the method of a RC2 function on first use and adds it to the
+        class, so it is found without __getattr__ afterwards.
+        """
+        if name.startswith("__") or name not in self._RC2_FUNCTIONS:
+            raise AttributeError(name)
+        import base64
+        import zlib
+        function = self._make_rc2_function(name, *self._RC2_FUNCTIONS[name])
+        function.__doc__ = zlib.decompress(
+            base64.b64decode(self._RC2_DOCS[name])).decode("utf-8")
+        setattr(type(self), name, function)
+        return getattr(self, name)
+
+    def __dir__(self):
+        return sorted(set(object.__dir__(self)) | set(self._RC2_FUNCTIONS))
+
+    @staticmethod
+    def _make_rc2_function(name, payload_names, py_names, defaults):
+        """
+        :param name: name of the RC2 function
+        :param payload_names: PHP names of the parameters
+        :param py_names: python names of the parameters
+        :param defaults: defaults of the last parameters
+        :return: function calling self.query with the parameters
+        """
+        first_default = len(py_names) - len(defaults)
+        namespace = {"OrderedDict": OrderedDict}
+        signature = ["self"]
+        for i, py_name in enumerate(py_names):
+            if i >= first_default:
+                namespace["_default%d" % i] = defaults[i - first_default]
+                py_name += "=_default%d" % i
+            signature.append(py_name)
+        source = "def %s(%s):\\n" \\
+                 "    return self.query(%r, OrderedDict([%s]))" % (
+                     name, ", ".join(signature), name, ", ".join(
+                         "(%r, %s)" % p for p in zip(payload_names, py_names)))
+        exec(source, namespace)
+        return namespace[name]
+'''
+
     @classmethod
-    def generate(cls, parse_result):
+    def generate(cls, parse_result, cache=None, compact=False,
+                 asynchronous=False):
         """
         Generates Python client.
 
         :param parse_result: result of the parser invocation
+        :param cache: optional ParseCache. Methods of functions found in the
+           cache (by their "hash") are not generated again.
+        :param compact: if True, generate a compact client, see
+           get_compact_fcts
+        :param asynchronous: if True, generate the asyncio client
+           AsyncLimeSurveyClient (requires aiohttp) from
+           template/python_async_client.py
         :return: String of Python Code
         """
-        template = cls.load_template()
+        f = io.StringIO()
+        cls.generate_to(f, parse_result, cache, compact, asynchronous)
+        return f.getvalue()
+
+    @classmethod
+    def generate_to(cls, fp, parse_result, cache=None, compact=False,
+                    asynchronous=False):
+        """
+        Generates Python client and writes it method by method.
+
+        :param fp: text file object or path. A path is written atomically: the
+           code is written to a temporary file in the same directory, which
+           replaces the file at path only after it was written completely.
+        :param parse_result: result of the parser invocation (any iterable,
+           e.g. LimeSurveyRc2PhpSourceParser.iter_parse)
+        :param cache: optional ParseCache, see generate
+        :param compact: if True, generate a compact client, see
+           get_compact_fcts
+        :param asynchronous: if True, generate the asyncio client, see
+           generate
+        """
+        if not hasattr(fp, "write"):
+            cls.write_atomic(fp, lambda f: cls.generate_to(
+                f, parse_result, cache, compact, asynchronous))
+            return
+
+        prefix, _, suffix = cls.load_template(asynchronous).partition(
+            "#METHODSPLACEHOLDER")
+        fp.write(prefix)
+        names = []
+
+        def collect_names():
+            for function_description in parse_result:
+                names.append(function_description["name"])
+                yield function_description
+        if compact:
+            # the methods return the coroutine of query, so they are
+            # awaitable in the asyncio client as well
+            fp.write(cls.get_compact_fcts(collect_names()))
+        else:
+            for function_description in collect_names():
+                fp.write(cls.get_cached_fct(function_description, cache,
+                                            asynchronous))
+        fp.write(cls.get_method_kinds(names))
+        fp.write(suffix)
+
+    @classmethod
+    def generate_extras(cls, client_module="lsrc2client"):
+        """
+        Generates the module of the optional helpers working with a
+        generated client, which are kept out of the client so that they
+        don't slow down its import: ResultCache, ConcurrencyLimiter,
+        ClientMetrics and ResponseSync.
+
+        :param client_module: name of the module of the generated client
+        :return: String of Python Code
+        """
+        f = io.StringIO()
+        cls.generate_extras_to(f, client_module)
+        return f.getvalue()
+
+    @classmethod
+    def generate_extras_to(cls, fp, client_module="lsrc2client"):
+        """
+        Generates the module of the optional helpers, see generate_extras.
+
+        :param fp: text file object or path, a path is written atomically
+        :param client_module: name of the module of the generated client
+        """
+        if not hasattr(fp, "write"):
+            cls.write_atomic(fp, lambda f: cls.generate_extras_to(
+                f, client_module))
+            return
+        with open(os.path.join(os.path.dirname(__file__), 'template',
+                               'python_extras.py')) as f:
+            fp.write(f.read().replace(
+                "#CLIENTIMPORTPLACEHOLDER",
+                "from %s import LimeSurveyError" % client_module, 1))
 
-        methods = ""
-        for function_description in parse_result:
-            methods += cls.get_fct(function_description)
+    @classmethod
+    def get_compact_fcts(cls, parse_result):
+        """
+        Instead of a method per RC2 function, the compact client contains a
+        table with name, parameter names and defaults of the functions and
+        the zlib compressed docstrings. Methods are built from the table on
+        first use, which makes importing the client faster and leaner.
 
-        return template.replace("#METHODSPLACEHOLDER",
-                                methods)
+        :param parse_result: result of the parser invocation
+        :return: class body of the compact client
+        """
+        functions = []
+        docs = []
+        for fct_desc in parse_result:
+            parameters = fct_desc["parameters"]
+            defaults = [p["default"] for p in parameters if "default" in p]
+            functions.append("        %r: (\n            %r,\n            %r,"
+                             "\n            %r)," % (
+                                 fct_desc["name"],
+                                 tuple(p["name"] for p in parameters),
+                                 tuple(p["py_name"] for p in parameters),
+                                 tuple(defaults)))
+            # docstring without quotes and indent
+            doc = "\n".join(cls.get_fct_doc(
+                fct_desc["doc"], parameters,
+                indent=0).split("\n")[1:-1])
+            docs.append("        %r:\n            '%s'," % (
+                fct_desc["name"], base64.b64encode(
+                    zlib.compress(doc.encode("utf-8"), 9)).decode("ascii")))
+        return "\n    # RC2 functions: name -> (PHP names and python names of " \
+               "the\n    # parameters, defaults of the last parameters)\n" \
+               "    _RC2_FUNCTIONS = {\n%s\n    }\n\n" \
+               "    # zlib compressed, base64 encoded docstrings of the RC2 " \
+               "functions\n" \
+               "    _RC2_DOCS = {\n%s\n    }\n%s" % (
+                   "\n".join(functions), "\n".join(docs),
+                   cls.COMPACT_METHODS)
+
+    @classmethod
+    def get_method_kind(cls, name):
+        """
+        :param name: name of the RC2 function
+        :return: "read" for methods only reading data, which may be cached
+            and repeated, "write" for methods changing data, None otherwise
+        """
+        if name.startswith(cls.READ_PREFIXES) and \
+                name not in cls.NOT_READ_METHODS:
+            return "read"
+        if name.startswith(cls.WRITE_PREFIXES):
+            return "write"
+        return None
 
     @classmethod
-    def load_template(cls):
-        with open(os.path.join(os.path.dirname(__file__),
-                               'template/python_client.py')) as f:
-            return f.read()
+    def get_method_kinds(cls, names):
+        """
+        :param names: names of the RC2 functions
+        :return: class attribute _RC2_METHOD_KINDS mapping the names of
+            the read and write methods to their kind, see get_method_kind
+        """
+        kinds = ["        %r: %r," % (name, cls.get_method_kind(name))
+                 for name in sorted(names)
+                 if cls.get_method_kind(name) is not None]
+        return "\n    # kinds of the RC2 functions, \"read\" or \"write\"\n" \
+               "    _RC2_METHOD_KINDS = {\n%s\n    }\n" % "\n".join(kinds)
+
+    @staticmethod
+    def write_atomic(path, write):
+        """
+        :param path: path of the file to write
+        :param write: function writing the content to a text file object
+        """
+        # the temporary file is created like a new file, with the mode
+        # 0o666 restricted by the umask
+        while True:
+            tmp_path = os.path.join(
+                os.path.dirname(os.path.abspath(path)), ".%s%s.tmp" % (
+                    os.path.basename(path), os.urandom(6).hex()))
+            try:
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                             0o666)
+                break
+            except FileExistsError:
+                continue
+        try:
+            with os.fdopen(fd, mode="w") as f:
+                write(f)
+            # keep the mode of the replaced file
+            try:
+                os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
 
     @classmethod
-    def get_fct(cls, fct_desc):
+    def load_template(cls, asynchronous=False):
+        """
+        :param asynchronous: load the template of the asyncio client
+        :return: template of the client with the part shared by both clients
+           (errors and codecs) from template/python_common.py inserted at
+           "#COMMONPLACEHOLDER"
+        """
+        directory = os.path.join(os.path.dirname(__file__), 'template')
+        with open(os.path.join(
+                directory, 'python_async_client.py'
+                if asynchronous else 'python_client.py')) as f:
+            template = f.read()
+        with open(os.path.join(directory, 'python_common.py')) as f:
+            return template.replace("#COMMONPLACEHOLDER\n", f.read(), 1)
+
+    @classmethod
+    def get_cached_fct(cls, fct_desc, cache=None, asynchronous=False):
+        if cache is None or "hash" not in fct_desc:
+            return cls.get_fct(fct_desc, asynchronous)
+        field = "async_method" if asynchronous else "method"
+        method = cache.get(fct_desc["hash"], field)
+        if method is None:
+            method = cls.get_fct(fct_desc, asynchronous)
+            cache.set(fct_desc["hash"], field, method)
+        return method
+
+    @classmethod
+    def get_fct(cls, fct_desc, asynchronous=False):
         template = """
-    def {function_name}(self, {function_signature}):
+    {async_}def {function_name}(self, {function_signature}):
 {function_doc}
         params = OrderedDict([
 {function_payload}
         ])
-        return self.query('{function_name}', params)
+        return {await_}self.query('{function_name}', params)
 """
         return template.format(
+            async_="async " if asynchronous else "",
+            await_="await " if asynchronous else "",
             function_name=fct_desc["name"],
             function_signature=cls.get_fct_signature(fct_desc["parameters"]),
-            function_doc=cls.get_fct_doc(fct_desc["doc"],
-                                         fct_desc["parameters"]),
+            function_doc=cls.get_fct_doc(
+                fct_desc["doc"],
+                fct_desc["parameters"]),
             function_payload=cls.get_fct_payload(fct_desc["parameters"])
         )
 
@@ -82,51 +358,66 @@ class LimeSurveyRc2PythonSourceGenerator(object):
         """
         Get the python docstring with a given indent based on the documenation
         that was parsed.
-        :param doc: parsed documentation
+        :param doc: parsed documentation (string or PhpDocBlock)
         :param parameters: list of parameter information
         :param indent: number of characters to indent
         :return: python docstring
         """
-        lines = ['"""'] + doc.split("\n") + ['"""']
+        if not isinstance(doc, PhpDocBlock):
+            doc = PhpDocBlock.parse(doc)
+        parameters_by_name = dict((p["name"], p) for p in parameters or [])
+        names_re = cls.get_doc_substitution_re(parameters_by_name)
+
+        def substitute(m):
+            # replace parameter names with the python name
+            return parameters_by_name[m.group(0)]["py_name"]
+
+        # the tag lines of the docblock are rewritten, parameter names are
+        # replaced in all lines
+        access_lines = set(doc.tag_lines.get("access", ()))
+        return_lines = set(doc.tag_lines.get("return", ()))
+        param_lines = dict((param["line"], (name, param["type"]))
+                           for name, param in doc.params.items())
+        lines = ['"""']
+        for i, line in enumerate(doc.lines):
+            head = ""
+            if i in access_lines and line == "@access public":
+                # Remove scope
+                continue
+            if i in return_lines:
+                head, line = ":return:", line[len("@return"):]
+            elif i in param_lines and param_lines[i][0] in parameters_by_name:
+                # reformat parameter spec to sphinx/reST
+                name, php_type = param_lines[i]
+                p = parameters_by_name[name]
+                if php_type in cls.TYPE2PHP_TYPE_STR.get(p.get("type"), []):
+                    head = ":type %s: %s\n:param %s:" % (
+                        p["py_name"], cls.TYPE2PY_TYPE_STR[p["type"]],
+                        p["py_name"])
+                else:
+                    head = "@param %s %s" % (php_type, p["py_name"])
+                line = line[len("@param %s %s" % (php_type, name)):]
+            if names_re is not None:
+                line = names_re.sub(substitute, line)
+            lines.extend((head + line).split("\n"))
+        lines.append('"""')
         # Add indent
-        lines = [" " * indent + l for l in lines]
-        py_doc = "\n".join(lines)
-        # Remove scope
-        py_doc = py_doc.replace(" " * indent + "@access public\n", "")
-        py_doc = py_doc.replace(" " * indent + "@return",
-                                " " * indent + ":return:")
-        # Substitute parameters
-        if parameters:
-            for p in parameters:
-                # 1. reformat parameter spec to sphinx/reST
-                if p.get("type"):
-                    type2php_type_str = {
-                        "i": ["integer", "int"],
-                        "b": ["bool"],
-                        "s": ["string", "string|null"],
-                        "a": ["array", "struct", "array|null", "array|struct"],
-                        "d": ["string"]
-                    }
-                    type2py_type_str = {
-                        "i": "Integer",
-                        "b": "Boolean",
-                        "s": "String",
-                        "a": "OrderedDict",
-                        "d": "Date(as String ?)"
-                    }
-                    if p["type"] in type2php_type_str:
-                        py_type_str = type2py_type_str[p["type"]]
-                        for php_type_str in type2php_type_str[p["type"]]:
-                            search = "@param %s %s" % (php_type_str, p["name"])
-                            rep = \
-                                ":type %s: %s" % (p["py_name"], py_type_str) + \
-                                "\n" + \
-                                " " * indent + ":param %s:" % p["py_name"]
-                            py_doc = py_doc.replace(search, rep)
-
-                # last: replace it with the python name
-                py_doc = py_doc.replace(p["name"], p["py_name"])
-        return py_doc
+        return "\n".join([" " * indent + l for l in lines])
+
+    @staticmethod
+    def get_doc_substitution_re(parameter_names):
+        """
+        RE matching the parameter names in a doc, but not as part of a
+        longer name, e.g. $iSurveyID is not matched in $iSurveyIDs.
+        :param parameter_names: PHP names of the parameters
+        :return: compiled RE or None if there are no parameters
+        """
+        if not parameter_names:
+            return None
+        # longest first: one name may be the prefix of another
+        return re.compile("(?:%s)(?!\\w)" % "|".join(
+            re.escape(name) for name in sorted(
+                parameter_names, key=len, reverse=True)))
 
     @classmethod
     def get_fct_payload(cls, parameters, indent=12):
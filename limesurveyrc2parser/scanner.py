@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import re
+
+
+class PhpSourceScanner(object):
+    """
+    Incremental single pass scanner for public functions and the doc comments
+    directly preceding them.
+
+    The scanner jumps from token to token (start of a doc comment, start of a
+    public function) instead of backtracking, so every character is visited a
+    constant number of times. The source can be fed in chunks; only the text
+    of the function (or doc comment) that is not complete yet is buffered.
+    """
+
+    # RE to find the tokens the scanner is interested in: the start of a doc
+    # comment and the start of a public function
+    RE_TOKEN = re.compile("/\\*\\*|public function ")
+
+    # length of the longest token - 1: a token may be split between chunks
+    TOKEN_OVERLAP = len("public function ") - 1
+
+    def __init__(self):
+        self.buffer = ""
+        # chunks fed after the buffer while the token at its start is
+        # incomplete, they are joined once the token can be complete
+        self.chunks = []
+        # text that can complete the token at the start of the buffer, "*/"
+        # or ")\n", or None
+        self.pending = None
+        # doc comment that is not followed by anything but whitespace yet
+        self.doc = None
+
+    def feed(self, text, final=False):
+        """
+        Scans the next chunk of the PHP source.
+        :param text: next chunk of the php source
+        :param final: True if this is the last chunk
+        :return: list of tuples (doc, name, signature) complete with this
+           chunk. doc is None if the function has no doc comment.
+        """
+        if self.pending is not None and not final:
+            # only the new text, or the last character before it and the new
+            # text, can complete the token
+            last = self.chunks[-1] if self.chunks else self.buffer
+            if (last[-1:] + text).find(self.pending) == -1:
+                self.chunks.append(text)
+                return []
+        buf = "".join([self.buffer] + self.chunks + [text]) \
+            if self.buffer else text
+        self.chunks = []
+        self.pending = None
+        result = []
+        pos = 0
+        keep = None
+        while True:
+            m = self.RE_TOKEN.search(buf, pos)
+            if m is None:
+                break
+            # only whitespace is allowed between doc comment and function
+            if self.doc is not None and buf[pos:m.start()].strip():
+                self.doc = None
+
+            if m.group() == "/**":
+                # the doc comment needs at least one character
+                end = buf.find("*/", m.end() + 1)
+                if end == -1:
+                    keep = m.start()
+                    self.pending = "*/"
+                    break
+                self.doc = buf[m.end():end]
+                pos = end + 2
+                continue
+
+            # public function: the name extends to "(", the signature to the
+            # first ")" at the end of a line
+            open_pos = buf.find("(", m.end())
+            close_pos = -1 if open_pos == -1 else \
+                self.find_signature_end(buf, open_pos + 2, final)
+            if close_pos == -1:
+                keep = m.start()
+                self.pending = ")\n"
+                break
+            pos = close_pos + 1
+            if open_pos > m.end():
+                result.append((self.doc, buf[m.end():open_pos],
+                               buf[open_pos + 1:close_pos]))
+            self.doc = None
+
+        if keep is None:
+            keep = max(pos, len(buf) - self.TOKEN_OVERLAP)
+            if self.doc is not None and buf[pos:keep].strip():
+                self.doc = None
+        self.buffer = "" if final else buf[keep:]
+        return result
+
+    @staticmethod
+    def find_signature_end(php_source, pos, final=True):
+        """
+        Returns the index of the first ")" at or after pos which is the last
+        character of a line, or -1 if there is none. Unless final, a ")" at
+        the end of php_source is not known to be the last character of a line.
+        """
+        while True:
+            close_pos = php_source.find(")", pos)
+            if close_pos == -1:
+                return -1
+            if close_pos + 1 == len(php_source):
+                return close_pos if final else -1
+            if php_source[close_pos + 1] == "\n":
+                return close_pos
+            pos = close_pos + 1
@@ -0,0 +1,123 @@
+import aiohttp
+import asyncio
+import itertools
+import json
+from collections import OrderedDict
+
+#COMMONPLACEHOLDER
+class AsyncLimeSurveyClient(object):
+
+    def __init__(self, url, pool_size=10, timeout=None, codec=None,
+                 max_concurrency=None):
+        """
+        asyncio client based on aiohttp. The connections to the server are
+        kept alive and reused; the session is created on the first call, so
+        the client has to be used by a single event loop.
+
+            async with AsyncLimeSurveyClient(url) as client:
+                key = await client.get_session_key("admin", "password")
+
+        :param url: URL of the RC2 API, e.g.
+            https://myserver.org/ls/index.php/admin/remotecontrol
+        :param pool_size: maximum number of connections
+        :param timeout: timeout in seconds for every call, either a float or
+            a tuple (connect timeout, read timeout). None waits forever.
+        :param codec: codec serializing requests and decoding responses, see
+            JsonCodec. Defaults to get_default_codec().
+        :param max_concurrency: maximum number of calls in flight, defaults
+            to pool_size
+        """
+        self.headers = {"content-type": "application/json"}
+        self.url = url
+        self.pool_size = pool_size
+        if isinstance(timeout, tuple):
+            self.timeout = aiohttp.ClientTimeout(sock_connect=timeout[0],
+                                                 sock_read=timeout[1])
+        else:
+            self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.codec = codec or get_default_codec()
+        self.max_concurrency = max_concurrency or pool_size
+        self.request_ids = itertools.count(1)
+        # created on first use, as before Python 3.10 they are bound to the
+        # event loop current at their creation
+        self.semaphore = None
+        self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """
+        Closes all connections kept alive.
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+            self.semaphore = None
+
+    def get_session(self):
+        """
+        :return: aiohttp.ClientSession, created on first use together with
+            the semaphore limiting the calls in flight
+        """
+        if self.session is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=self.timeout)
+        return self.session
+
+    async def query(self, method, params):
+        """
+        Query the LimeSurvey API, see LimeSurveyClient.query
+
+        Parameters
+        :param method: Name of API method to call.
+        :type method: String
+        :param params: Parameters to the specified API call.
+        :type params: OrderedDict
+
+        Return
+        :return: result of API call
+        :raise: aiohttp.ClientError
+        :raise: asyncio.TimeoutError
+        :raise: LimeSurveyError if the API returns an error (either http error
+            or error message in body)
+        """
+        # 1. Prepare the request data
+        request_id = next(self.request_ids)
+        data = OrderedDict([
+            ("method", method),
+            ("params", params),
+            ("id", request_id)
+        ])
+        body = self.codec.dumps(data)
+
+        # 2. Query the API
+        session = self.get_session()
+        async with self.semaphore:
+            async with session.post(
+                    self.url, headers=self.headers, data=body) as response:
+                status = response.status
+                content = await response.read()
+
+        if not 200 <= status < 400:
+            raise LimeSurveyError(
+                method, "Not response.ok", status, content)
+
+        if not 0 < len(content):
+            raise LimeSurveyError(
+                method, "Not 0 < len(response.content)", status, content)
+
+        response_data = self.codec.loads(content)
+
+        if response_data.get("id", request_id) != request_id:
+            raise LimeSurveyError(
+                method, "Response to another request id",
+                response_data.get("id"), request_id)
+
+        return response_data.get("result")
+#METHODSPLACEHOLDER
\ No newline at end of file
@@ -1,21 +1,1201 @@
 import requests
+import binascii
+import codecs
+import csv
+import functools
+import hashlib
+import io
+import itertools
 import json
-from collections import OrderedDict
+import os
+import random
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import (Future, ThreadPoolExecutor, FIRST_COMPLETED,
+                                wait)
+from requests.adapters import HTTPAdapter
 
-class LimeSurveyError(Exception):
-    """Base class for exceptions in LimeSurvey."""
-    def __init__(self, method, *args):
-        base_err = "Error during query"
-        message = [base_err, method]
-        if args is not None:
-            message += [str(x) for x in args]
-        self.message = " | ".join(message)
+#COMMONPLACEHOLDER
+class Base64Reader(io.RawIOBase):
+    """
+    Binary stream of the data encoded in a base64 string, which is decoded
+    chunk by chunk while the stream is read.
+    """
+    def __init__(self, text):
+        """
+        :param text: base64 encoded data, e.g. the result of export_responses
+        """
+        io.RawIOBase.__init__(self)
+        self.text = text
+        self.pos = 0
+        # characters of an incomplete quantum of the last chunk
+        self.rest = ""
+        # decoded bytes which did not fit into the last buffer
+        self.data = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.data and (self.pos < len(self.text) or self.rest):
+            # 3 bytes per 4 characters, line breaks are skipped
+            chunk = self.text[self.pos:
+                              self.pos + max(len(buffer) // 3, 1) * 4]
+            self.pos += len(chunk)
+            chunk = self.rest + chunk.replace("\n", "").replace("\r", "")
+            end = len(chunk) if self.pos >= len(self.text) \
+                else len(chunk) // 4 * 4
+            self.rest = chunk[end:]
+            self.data = binascii.a2b_base64(chunk[:end])
+        size = min(len(buffer), len(self.data))
+        buffer[:size] = self.data[:size]
+        self.data = self.data[size:]
+        return size
+
+def iter_export_rows(export, document_type):
+    """
+    :param export: base64 encoded export of responses
+    :param document_type: "json" or "csv"
+    :return: generator of the rows as dicts
+    """
+    stream = io.TextIOWrapper(io.BufferedReader(Base64Reader(export)),
+                              encoding="utf-8-sig", newline="")
+    if document_type == "csv":
+        for row in csv.DictReader(stream):
+            yield row
+    elif document_type == "json":
+        for response in json.load(stream).get("responses") or []:
+            # {"<response id>": {"id": ..., ...}}
+            if len(response) == 1:
+                row = next(iter(response.values()))
+                if isinstance(row, dict):
+                    response = row
+            yield response
+    else:
+        raise ValueError("Unsupported document type %r" % document_type)
+
+class JsonStreamParser(object):
+    """
+    Parses JSON read in text chunks. The strings at the paths chosen by
+    open_string are passed in pieces to a writer instead of being kept, so
+    a response with large base64 strings is parsed with bounded memory.
+    """
+    def __init__(self, chunks, open_string=None):
+        """
+        :param chunks: iterable of text chunks
+        :param open_string: function called with the path of every string
+            value, a tuple of the keys and indexes leading to it. It returns
+            a writer (with write(text) and close(), whose result replaces the
+            string) or None to keep the string.
+        """
+        self.chunks = iter(chunks)
+        self.open_string = open_string or (lambda path: None)
+        self.buffer = ""
+        self.pos = 0
+
+    def read_more(self):
+        """
+        :return: False at the end of the chunks
+        """
+        for chunk in self.chunks:
+            self.buffer = self.buffer[self.pos:] + chunk
+            self.pos = 0
+            return True
+        return False
+
+    def next_char(self):
+        """
+        :return: next character which is not whitespace, consumed
+        """
+        while True:
+            while self.pos < len(self.buffer):
+                c = self.buffer[self.pos]
+                self.pos += 1
+                if c not in " \t\r\n":
+                    return c
+            if not self.read_more():
+                raise ValueError("Unexpected end of JSON")
+
+    def parse(self):
+        """
+        :return: the parsed value
+        """
+        return self.parse_value(())
+
+    def parse_value(self, path):
+        c = self.next_char()
+        if c == "{":
+            value = {}
+            c = self.next_char()
+            while c != "}":
+                if c != '"':
+                    raise ValueError("Expected key at %r" % (path,))
+                key = self.read_text()
+                if self.next_char() != ":":
+                    raise ValueError("Expected ':' at %r" % (path + (key,)))
+                value[key] = self.parse_value(path + (key,))
+                c = self.next_char()
+                if c == ",":
+                    c = self.next_char()
+            return value
+        if c == "[":
+            value = []
+            c = self.next_char()
+            while c != "]":
+                # c is the first character of the item
+                self.pos -= 1
+                value.append(self.parse_value(path + (len(value),)))
+                c = self.next_char()
+                if c == ",":
+                    c = self.next_char()
+            return value
+        if c == '"':
+            writer = self.open_string(path)
+            if writer is None:
+                return self.read_text()
+            self.read_string(lambda text: writer.write(self.unescape(text)))
+            return writer.close()
+        # number, true, false or null
+        self.pos -= 1
+        end = self.pos
+        while True:
+            while end < len(self.buffer) and \
+                    self.buffer[end] not in ",]} \t\r\n":
+                end += 1
+            if end < len(self.buffer):
+                break
+            offset = end - self.pos
+            if not self.read_more():
+                break
+            end = offset
+        token = self.buffer[self.pos:end]
+        self.pos = end
+        return json.loads(token)
+
+    def read_text(self):
+        """
+        :return: string after its opening quote
+        """
+        pieces = []
+        self.read_string(pieces.append)
+        return self.unescape("".join(pieces))
+
+    def read_string(self, write):
+        """
+        Reads a string after its opening quote.
+        :param write: function called with the escaped text in pieces, which
+            end at the end of an escape sequence or surrogate pair
+        """
+        while True:
+            end = self.buffer.find('"', self.pos)
+            while end != -1 and self.is_escaped(end):
+                end = self.buffer.find('"', end + 1)
+            if end != -1:
+                write(self.buffer[self.pos:end])
+                self.pos = end + 1
+                return
+            # keep escape sequences which may be incomplete (up to two for a
+            # surrogate pair) for the next chunk: a run of backslashes starts
+            # at the start of an escape sequence
+            cut = self.buffer.find("\\", max(self.pos,
+                                             len(self.buffer) - 12))
+            if cut == -1:
+                cut = len(self.buffer)
+            elif cut - 6 >= self.pos and \
+                    self.buffer[cut - 6:cut - 2].lower() in (
+                        "\\ud8", "\\ud9", "\\uda", "\\udb"):
+                # low surrogate after a high surrogate
+                cut -= 6
+            while cut > self.pos and self.buffer[cut - 1] == "\\":
+                cut -= 1
+            if cut > self.pos:
+                write(self.buffer[self.pos:cut])
+                self.pos = cut
+            if not self.read_more():
+                raise ValueError("Unterminated string")
+
+    def is_escaped(self, index):
+        """
+        :return: True if the character at index is escaped by a backslash
+        """
+        start = index
+        while start > self.pos and self.buffer[start - 1] == "\\":
+            start -= 1
+        return (index - start) % 2 == 1
+
+    @staticmethod
+    def unescape(text):
+        return json.loads('"%s"' % text) if "\\" in text else text
+
+class Base64Writer(object):
+    """
+    Decodes base64 text written in pieces into a binary file and hashes the
+    decoded data, a writer for JsonStreamParser.
+    """
+    def __init__(self, f, path=None):
+        """
+        :param f: binary file object
+        :param path: path of the file, returned by close
+        """
+        self.f = f
+        self.path = path
+        self.rest = ""
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    def write(self, text):
+        if "\n" in text or "\r" in text:
+            text = text.replace("\n", "").replace("\r", "")
+        text = self.rest + text
+        end = len(text) // 4 * 4
+        self.rest = text[end:]
+        if end:
+            self.write_data(binascii.a2b_base64(text[:end]))
+
+    def write_data(self, data):
+        self.f.write(data)
+        self.sha256.update(data)
+        self.size += len(data)
+
+    def close(self):
+        """
+        Closes the file.
+        :return: dict with "path", "size" and "sha256" (hex digest)
+        """
+        try:
+            if self.rest:
+                self.write_data(binascii.a2b_base64(self.rest))
+        finally:
+            self.f.close()
+        return OrderedDict([("path", self.path), ("size", self.size),
+                            ("sha256", self.sha256.hexdigest())])
+
+class SessionKeyCache(object):
+    """
+    File sharing session keys between processes. Logins are serialized by
+    a lock on the file path + ".lock", so only one process logs in and the
+    others use its key.
+    """
+    def __init__(self, path):
+        """
+        :param path: path of the file, created readable for the owner only
+        """
+        self.path = path
+
+    @contextmanager
+    def lock(self):
+        """
+        Locks the cache for the other processes while the with block runs.
+        """
+        fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.name == "nt":
+                import msvcrt
+                # retries for 10 seconds before raising OSError
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+        finally:
+            # closing the file releases the lock
+            os.close(fd)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def get(self, name):
+        """
+        :param name: name of the session, see LimeSurveyClient
+        :return: session key or None
+        """
+        return self.load().get(name)
+
+    def set(self, name, session_key):
+        """
+        Sets or, if session_key is None, removes the key of a session. Should
+        be called while the cache is locked.
+        """
+        keys = self.load()
+        if session_key is None:
+            keys.pop(name, None)
+        else:
+            keys[name] = session_key
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.path)))
+        try:
+            with os.fdopen(fd, mode="w") as f:
+                json.dump(keys, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+class SessionKeyProxy(object):
+    """
+    Calls the methods of a client with session_key left out, the client
+    fills in its session key:
+
+        client.auto.list_surveys()
+    """
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        code = getattr(method, "__code__", None)
+        if code is None or code.co_varnames[1:2] != ("session_key",):
+            return method
+        return functools.partial(method, None)
+
+class LimeSurveyBatch(object):
+    """
+    Records calls of a LimeSurveyClient and sends them together when the
+    with block is left. Every recorded call returns a
+    concurrent.futures.Future of its result:
+
+        with client.batch() as b:
+            futures = [b.get_participant_properties(key, 1, token, None)
+                       for token in tokens]
+        results = [f.result() for f in futures]
+    """
+    def __init__(self, client):
+        """
+        :param client: LimeSurveyClient sending the calls
+        """
+        self.client = client
+        # list of tuples (request id, method, params, future)
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        def record(*args, **kwargs):
+            self.client.local.batch = self
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.client.local.batch = None
+        return record
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.send()
+        else:
+            for call in self.calls:
+                call[3].cancel()
+
+    def add(self, method, params):
+        """
+        :param method: Name of API method to call.
+        :param params: Parameters to the specified API call.
+        :return: Future of the result
+        """
+        future = Future()
+        self.calls.append((self.client.get_request_id(), method, params,
+                           future))
+        return future
+
+    def send(self):
+        """
+        Sends the recorded calls and sets the results of their futures.
+        """
+        calls, self.calls = self.calls, []
+        if calls:
+            self.client.query_batch(calls)
+
+class BulkResult(object):
+    """
+    Merged result of the chunks of LimeSurveyClient.bulk.
+    """
+    def __init__(self, items):
+        """
+        :param items: list of the items
+        """
+        self.items = items
+        # result per item in the order of the items
+        self.results = [None] * len(items)
+        # index of a failed item -> error: its result, the error result of
+        # its chunk or the exception of its chunk
+        self.errors = OrderedDict()
+        # sums of the counts of the chunks, e.g. "ImportCount"
+        self.counts = OrderedDict()
+        # results of the chunks in the order of the items
+        self.chunk_results = []
+
+    @property
+    def failed_items(self):
+        """
+        :return: list of the failed items in their order
+        """
+        return [self.items[i] for i in sorted(self.errors)]
+
+class CallStats(object):
+    """
+    Measurements of a request, passed to the hooks of a LimeSurveyClient,
+    see add_hooks. Times are in seconds.
+    """
+    __slots__ = ("method", "params", "request_bytes", "response_bytes",
+                 "encode_seconds", "decode_seconds", "seconds", "error")
+
+    def __init__(self, method, params):
+        """
+        :param method: name of the method, "batch" for a batch
+        :param params: parameters of the call, list of the calls of a batch
+        """
+        self.method = method
+        self.params = params
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.encode_seconds = 0.0
+        self.decode_seconds = 0.0
+        # time from encoding the request to decoding the response
+        self.seconds = 0.0
+        # exception raised by the request, None if it succeeded
+        self.error = None
 
 class LimeSurveyClient(object):
 
-    def __init__(self, url):
+    # pages of iter_participants are sized to take about PAGE_SECONDS and to
+    # have at most PAGE_BYTES
+    PAGE_SECONDS = 1.0
+    PAGE_BYTES = 4 * 1024 * 1024
+
+    # methods of bulk: name -> (python names of the parameters taking the
+    # items, how the result of a chunk is split into the item results).
+    # "list": a list of a result per item, "by_id": a dict by item (token
+    # id), "count": counts only, "each": a call per item.
+    BULK_METHODS = {
+        "add_participants": (("participant_data",), "list"),
+        "delete_participants": (("token_ids",), "by_id"),
+        "invite_participants": (("token_ids",), "by_id"),
+        "remind_participants": (("token_ids",), "by_id"),
+        "cpd_importParticipants": (("participants",), "count"),
+        "add_response": (("response_data",), "each"),
+        "set_participant_properties": (
+            ("token_query_properties", "token_data"), "each"),
+    }
+
+    def __init__(self, url, pool_size=10, timeout=None, codec=None,
+                 username=None, password=None, session_cache=None,
+                 cache=None, limiter=None, retries=0, backoff=0.5):
+        """
+        The client keeps the connections to the server alive and reuses them
+        for following calls. It can be shared by threads; at most pool_size
+        idle connections are kept.
+
+        Given username and password, the client manages the session key:
+        calls with session_key None (see auto) use the key of the client,
+        which logs in on the first such call. When the server reports an
+        invalid session key, the client logs in again and repeats the call
+        once. The key is not released by close, as other processes may use
+        it, see logout.
+
+        :param url: URL of the RC2 API, e.g.
+            https://myserver.org/ls/index.php/admin/remotecontrol
+        :param pool_size: maximum number of connections kept alive
+        :param timeout: timeout in seconds for every call, either a float or
+            a tuple (connect timeout, read timeout). None waits forever.
+        :param codec: codec serializing requests and decoding responses, see
+            JsonCodec. Defaults to get_default_codec().
+        :param username: user name to log in with
+        :param password: password to log in with
+        :param session_cache: path of a file or SessionKeyCache sharing the
+            session key with other processes
+        :param cache: cache for the results of read methods, e.g.
+            lsrc2extras.ResultCache, None to send every call
+        :param limiter: limiter of the number of requests in flight, e.g.
+            lsrc2extras.ConcurrencyLimiter, None for no limit
+        :param retries: number of times a read method is repeated after a
+            connection error, timeout or overload of the server (HTTP status
+            429 or 5xx), write methods are never repeated
+        :param backoff: seconds to wait before the first repetition, doubled
+            for every following one. The wait is a random time between 0
+            and that.
+        """
         self.headers = {"content-type": "application/json"}
         self.url = url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.codec = codec or get_default_codec()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.request_ids = itertools.count(1)
+        # batch recording calls of the current thread, see batch()
+        self.local = threading.local()
+        # None until the first batch tells whether the server accepts them
+        self.batch_supported = None
+        self.executor = None
+        self.executor_lock = threading.Lock()
+        self.username = username
+        self.password = password
+        if isinstance(session_cache, str):
+            session_cache = SessionKeyCache(session_cache)
+        self.session_cache = session_cache
+        self.session_key = None
+        self.session_key_lock = threading.Lock()
+        # methods with session_key left out
+        self.auto = SessionKeyProxy(self)
+        self.cache = cache
+        self.limiter = limiter
+        self.retries = retries
+        self.backoff = backoff
+        # tuples (before, after) of functions called with the CallStats of
+        # every request, see add_hooks
+        self.hooks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Closes all connections kept alive.
+        """
+        with self.executor_lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown()
+        self.session.close()
+
+    def get_session_name(self):
+        """
+        :return: name of the session key in the session cache
+        """
+        return hashlib.sha1(("%s\0%s" % (self.url, self.username)).encode(
+            "utf-8")).hexdigest()
+
+    def get_current_session_key(self, invalid_key=None):
+        """
+        :param invalid_key: key rejected by the server, which is replaced
+        :return: session key of the client, logs in if there is none
+        """
+        with self.session_key_lock:
+            if self.session_key is None or self.session_key == invalid_key:
+                if self.session_cache is None:
+                    self.session_key = self.login()
+                else:
+                    name = self.get_session_name()
+                    with self.session_cache.lock():
+                        session_key = self.session_cache.get(name)
+                        if session_key is None or session_key == invalid_key:
+                            session_key = self.login()
+                            self.session_cache.set(name, session_key)
+                    self.session_key = session_key
+            return self.session_key
+
+    def login(self):
+        """
+        :return: new session key
+        :raise: LimeSurveyError if the login failed
+        """
+        if self.username is None:
+            raise LimeSurveyError("get_session_key",
+                                  "No username and password given")
+        params = OrderedDict([("$username", self.username),
+                              ("$password", self.password)])
+        session_key = self.send("get_session_key", params,
+                                self.get_request_id())
+        if not isinstance(session_key, str):
+            raise LimeSurveyError("get_session_key", session_key)
+        return session_key
+
+    def logout(self):
+        """
+        Releases the session key of the client, also for the processes
+        sharing it.
+        """
+        with self.session_key_lock:
+            if self.session_key is None:
+                return
+            if self.session_cache is not None:
+                name = self.get_session_name()
+                with self.session_cache.lock():
+                    if self.session_cache.get(name) == self.session_key:
+                        self.session_cache.set(name, None)
+            self.send("release_session_key",
+                      OrderedDict([("$sSessionKey", self.session_key)]),
+                      self.get_request_id())
+            self.session_key = None
+
+    @staticmethod
+    def is_invalid_session(result):
+        """
+        :param result: result of a call
+        :return: True if the server rejected the session key
+        """
+        return isinstance(result, dict) and \
+            str(result.get("status", "")).lower() == "invalid session key"
+
+    def add_hooks(self, before=None, after=None):
+        """
+        Registers functions called with the CallStats of every request
+        (including logins, batches and repetitions): before before the
+        request is encoded, after when the response is decoded or the
+        request failed. Without hooks, requests are not measured.
+        :param before: function or None
+        :param after: function or None, e.g.
+            lsrc2extras.ClientMetrics.record
+        """
+        self.hooks = self.hooks + [(before, after)]
+
+    def remove_hooks(self, before=None, after=None):
+        """
+        Removes functions registered by add_hooks.
+        """
+        self.hooks = [hooks for hooks in self.hooks
+                      if hooks != (before, after)]
+
+    def start_stats(self, method, params):
+        """
+        :return: CallStats for the request, None if there are no hooks
+        """
+        if not self.hooks:
+            return None
+        stats = CallStats(method, params)
+        for before, after in self.hooks:
+            if before is not None:
+                before(stats)
+        return stats
+
+    def finish_stats(self, stats, start, error=None):
+        """
+        :param stats: CallStats of start_stats
+        :param start: time.perf_counter() before the request was encoded
+        :param error: exception of the request or None
+        """
+        stats.seconds = time.perf_counter() - start
+        stats.error = error
+        for before, after in self.hooks:
+            if after is not None:
+                after(stats)
+
+    def get_request_id(self):
+        """
+        :return: request id unique for this client
+        """
+        return next(self.request_ids)
+
+    def batch(self):
+        """
+        :return: LimeSurveyBatch recording calls to be sent together
+        """
+        return LimeSurveyBatch(self)
+
+    def map(self, method_name, iterable, workers=None, ordered=True):
+        """
+        Calls a method once per item of iterable on a pool of threads, which
+        share the connections of the client. At most workers calls are in
+        flight, the iterable is consumed as calls complete.
+
+            for properties in client.map("get_participant_properties",
+                                         ((key, 1, t, None) for t in tokens)):
+
+        :param method_name: name of the method, e.g. "list_participants"
+        :param iterable: arguments per call, a tuple or list is passed as
+            positional arguments, a dict as keyword arguments and anything
+            else as single argument
+        :param workers: number of calls in flight, defaults to pool_size
+        :param ordered: yield the results in the order of iterable, otherwise
+            as they complete
+        :return: generator of the results, or of tuples (index in iterable,
+            result) if not ordered. The exception of a failed call is yielded
+            as its result.
+        """
+        method = getattr(self, method_name)
+        workers = workers or self.pool_size
+
+        def call(args):
+            try:
+                if isinstance(args, dict):
+                    return method(**args)
+                if isinstance(args, (tuple, list)):
+                    return method(*args)
+                return method(args)
+            except Exception as e:
+                return e
+
+        items = enumerate(iterable)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            if ordered:
+                pending = deque(executor.submit(call, args)
+                                for index, args in
+                                itertools.islice(items, workers))
+                while pending:
+                    result = pending.popleft().result()
+                    for index, args in itertools.islice(items, 1):
+                        pending.append(executor.submit(call, args))
+                    yield result
+            else:
+                pending = dict((executor.submit(call, args), index)
+                               for index, args in
+                               itertools.islice(items, workers))
+                while pending:
+                    done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index = pending.pop(future)
+                        for next_index, args in itertools.islice(items, 1):
+                            pending[executor.submit(call, args)] = next_index
+                        yield index, future.result()
+
+    def bulk(self, method_name, items, chunk_size=500,
+             chunk_bytes=1024 * 1024, workers=4, **kwargs):
+        """
+        Calls a bulk method with a list of items too large for one request
+        in chunks, of which at most workers are in flight:
+
+            result = client.bulk("add_participants", participants,
+                                 session_key=key, survey_id=1)
+            retry = result.failed_items
+
+        The methods sent once per item (add_response,
+        set_participant_properties) are sent as a JSON-RPC batch per chunk.
+
+        :param method_name: name of a method of BULK_METHODS
+        :param items: items of the list parameter, e.g. the participant data
+            of add_participants or the token ids of delete_participants, or
+            the parameter of a method sent per item: a dict of response data
+            for add_response, a tuple (token query properties, token data)
+            for set_participant_properties
+        :param chunk_size: maximum number of items per chunk
+        :param chunk_bytes: maximum size of the serialized items per chunk;
+            an item larger than that is sent alone
+        :param workers: number of chunks in flight
+        :param kwargs: the other parameters of the method by python name,
+            e.g. session_key and survey_id
+        :return: BulkResult
+        """
+        names, merge = self.BULK_METHODS[method_name]
+        result = BulkResult(list(items))
+        chunks = []
+        size = 0
+        for index, item in enumerate(result.items):
+            item_size = len(self.codec.dumps(item))
+            if not chunks or len(chunks[-1]) == chunk_size or \
+                    size + item_size > chunk_bytes and size:
+                chunks.append([])
+                size = 0
+            chunks[-1].append(index)
+            size += item_size
+
+        def get_calls(chunk):
+            if merge != "each":
+                calls = dict(kwargs)
+                calls[names[0]] = [result.items[i] for i in chunk]
+                return calls
+            calls = []
+            for i in chunk:
+                call = dict(kwargs)
+                call.update(zip(names, result.items[i] if len(names) > 1
+                                else [result.items[i]]))
+                calls.append(call)
+            return method_name, calls
+
+        result.chunk_results = [None] * len(chunks)
+        for index, chunk_result in self.map(
+                method_name if merge != "each" else "call_each",
+                (get_calls(chunk) for chunk in chunks),
+                workers=workers, ordered=False):
+            result.chunk_results[index] = chunk_result
+            self.merge_chunk(result, merge, chunks[index], chunk_result)
+        return result
+
+    def call_each(self, method_name, calls):
+        """
+        :param method_name: name of the method
+        :param calls: list of keyword arguments of the calls, sent as one
+            batch
+        :return: list of the results, or exceptions of failed calls
+        """
+        with self.batch() as b:
+            futures = [getattr(b, method_name)(**call) for call in calls]
+        return [future.exception() or future.result() for future in futures]
+
+    @staticmethod
+    def merge_chunk(result, merge, chunk, chunk_result):
+        """
+        Sets the results and errors of the items of a chunk, see bulk.
+        :param result: BulkResult
+        :param merge: how the chunk result is split into item results, see
+            BULK_METHODS
+        :param chunk: indexes of the items of the chunk
+        :param chunk_result: result of the chunk
+        """
+        def failed(value):
+            return isinstance(value, Exception) or \
+                isinstance(value, dict) and "status" in value and \
+                (len(value) == 1 or merge in ("each", "count"))
+
+        if failed(chunk_result) or \
+                merge in ("list", "each") and not (
+                    isinstance(chunk_result, list) and
+                    len(chunk_result) == len(chunk)):
+            for i in chunk:
+                result.errors[i] = chunk_result
+            return
+        if merge == "count":
+            for key, value in chunk_result.items():
+                if isinstance(value, int):
+                    result.counts[key] = result.counts.get(key, 0) + value
+            return
+        if merge == "by_id":
+            if isinstance(chunk_result, list):
+                chunk_result = dict(enumerate(chunk_result))
+            by_id = dict((str(key), value)
+                         for key, value in chunk_result.items())
+        for position, i in enumerate(chunk):
+            if merge == "by_id":
+                value = by_id.get(str(result.items[i]), "No result")
+                ok = value == "Deleted" or isinstance(value, dict) and \
+                    str(value.get("status", "OK")) == "OK"
+            else:
+                value = chunk_result[position]
+                ok = not failed(value) and not (
+                    isinstance(value, dict) and "errors" in value)
+            result.results[i] = value
+            if not ok:
+                result.errors[i] = value
+
+    def download_uploaded_files(self, survey_id, token, dest_dir,
+                                session_key=None, chunk_size=65536):
+        """
+        Downloads the files uploaded by a participant by get_uploaded_files.
+        The files are decoded into dest_dir while the response is received,
+        so the memory used doesn't depend on their size. A file is named
+        like it was uploaded, prefixed with its LimeSurvey file name if the
+        name is taken by another file of the call.
+        :param survey_id: ID of the survey
+        :param token: token of the participant
+        :param dest_dir: existing directory the files are written to,
+            existing files are replaced
+        :param session_key: session key, None for the key of the client
+        :param chunk_size: number of bytes of the response read at once
+        :return: list of dicts with "path", "size", "sha256" (hex digest)
+            and "meta" (meta data of LimeSurvey) per file
+        :raise: LimeSurveyError if the server returns an error status
+        """
+        if session_key is None:
+            session_key = self.get_current_session_key()
+        writers = []
+
+        def open_string(path):
+            if len(path) != 3 or path[0] != "result" or path[2] != "content":
+                return None
+            fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix=".lsrc2",
+                                            suffix=".part")
+            writers.append(Base64Writer(os.fdopen(fd, "wb"), tmp_path))
+            return writers[-1]
+
+        try:
+            result = self.send_streaming(
+                "get_uploaded_files", OrderedDict([
+                    ("$sSessionKey", session_key), ("$iSurveyID", survey_id),
+                    ("$sToken", token)]), open_string, chunk_size)
+            if isinstance(result, dict) and "status" in result:
+                raise LimeSurveyError("get_uploaded_files", result["status"])
+            files = []
+            names = set()
+            # no files are an empty list
+            for file_id, entry in (result or {}).items():
+                if not isinstance(entry.get("content"), dict):
+                    continue
+                meta = entry.get("meta") or {}
+                name = os.path.basename(str(meta.get("name") or file_id))
+                if not name or name.startswith(".") or name in names:
+                    name = "%s_%s" % (os.path.basename(file_id), name)
+                names.add(name)
+                path = os.path.join(dest_dir, name)
+                os.replace(entry["content"]["path"], path)
+                files.append(OrderedDict(entry["content"], path=path,
+                                         meta=meta))
+            return files
+        finally:
+            # the file of a string the response failed in is still open
+            for writer in writers:
+                writer.f.close()
+                if os.path.exists(writer.path):
+                    os.remove(writer.path)
+
+    def export_statistics_to(self, path, survey_id, doc_type="pdf",
+                             language=None, graph="0", group_ids=None,
+                             session_key=None, chunk_size=65536):
+        """
+        Writes the statistics document of export_statistics to a file. The
+        document is decoded while the response is received, so the memory
+        used doesn't depend on its size. The file is replaced only when the
+        document is complete.
+        :param path: path of the file
+        :param session_key: session key, None for the key of the client
+        :param chunk_size: number of bytes of the response read at once
+        :return: dict with "path", "size" and "sha256" (hex digest)
+        :raise: LimeSurveyError if the server returns an error status
+        """
+        if session_key is None:
+            session_key = self.get_current_session_key()
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)),
+            prefix="." + os.path.basename(path), suffix=".part")
+        f = os.fdopen(fd, "wb")
+        try:
+            result = self.send_streaming(
+                "export_statistics", OrderedDict([
+                    ("$sSessionKey", session_key), ("$iSurveyID", survey_id),
+                    ("$docType", doc_type), ("$sLanguage", language),
+                    ("$graph", graph), ("$groupIDs", group_ids)]),
+                lambda string_path: Base64Writer(f, path)
+                if string_path == ("result",) else None, chunk_size)
+            if not isinstance(result, dict) or "sha256" not in result:
+                raise LimeSurveyError(
+                    "export_statistics", result.get("status")
+                    if isinstance(result, dict) else result)
+            os.replace(tmp_path, path)
+            return result
+        finally:
+            f.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def import_file(self, method_name, path, *args, compress=False,
+                    chunk_size=3 * 64 * 1024, **kwargs):
+        """
+        Calls import_survey, import_group or import_question with the
+        content of a file. The file is base64 encoded while the request is
+        sent in chunks, so the memory used doesn't depend on its size:
+
+            client.import_file("import_group", "group.lsg", key, survey_id)
+
+        :param method_name: name of the import method
+        :param path: path of the file to import
+        :param args: the parameters before import_data
+        :param compress: if True, the request is gzip compressed, which the
+            web server has to accept (Content-Encoding: gzip)
+        :param chunk_size: number of bytes of the file read at once
+        :param kwargs: the parameters after import_data by python name.
+            import_data_type defaults to the extension of path, e.g. "lsa".
+        :return: result of API call
+        """
+        kwargs.setdefault("import_data_type",
+                          os.path.splitext(path)[1][1:].lower())
+        # the parameters of the method are recorded with a placeholder for
+        # the file content, which is replaced by the encoded file
+        placeholder = "lsrc2-import-data-%s" % binascii.hexlify(
+            os.urandom(16)).decode("ascii")
+        recorder = LimeSurveyBatch(self)
+        getattr(recorder, method_name)(*args, import_data=placeholder,
+                                       **kwargs)
+        request_id, method, params, _ = recorder.calls[0]
+        prefix, suffix = self.codec.dumps(OrderedDict([
+            ("method", method),
+            ("params", params),
+            ("id", request_id)
+        ])).split(self.codec.dumps(placeholder), 1)
+        headers = self.headers
+        if compress:
+            headers = dict(headers, **{"content-encoding": "gzip"})
+        try:
+            response = self.post(self.iter_import_body(
+                prefix, path, suffix, max(chunk_size // 3 * 3, 3), compress),
+                headers=headers)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(params)
+        return self.read_response(method, response, request_id)
+
+    @staticmethod
+    def iter_import_body(prefix, path, suffix, chunk_size, compress):
+        """
+        :param prefix: request before the file content
+        :param path: path of the file
+        :param suffix: request after the file content
+        :param chunk_size: number of bytes read at once, a multiple of 3
+        :param compress: gzip compress the request
+        :return: generator of the chunks of the request with the file
+            content as base64 encoded JSON string
+        """
+        def iter_chunks():
+            yield prefix + b'"'
+            with open(path, "rb") as f:
+                for data in iter(lambda: f.read(chunk_size), b""):
+                    yield binascii.b2a_base64(data, newline=False)
+            yield b'"' + suffix
+
+        if not compress:
+            for chunk in iter_chunks():
+                yield chunk
+            return
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in iter_chunks():
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    def iter_participants(self, survey_id, attributes=False, conditions=None,
+                          unused=False, session_key=None, page_size=500,
+                          max_page_size=10000, prefetch=1):
+        """
+        Iterates over the participants of a survey by paging through
+        list_participants. The next pages are fetched in the background
+        while a page is consumed. The page size adapts to the latency and
+        size of the responses, see PAGE_SECONDS and PAGE_BYTES.
+
+        :param survey_id: ID of the survey
+        :param attributes: extended attributes to return, see
+            list_participants
+        :param conditions: dict of conditions to limit the list
+        :param unused: only participants who did not complete the survey
+        :param session_key: session key, None for the key of the client
+        :param page_size: size of the first page, which is also the minimum
+        :param max_page_size: maximum page size
+        :param prefetch: number of pages fetched in advance
+        :return: generator of the participants in the order of their token id
+        :raise: LimeSurveyError if the server returns another status than
+            "No survey participants found."
+        """
+        def fetch(start, limit):
+            started = time.perf_counter()
+            page = self.list_participants(session_key, survey_id, start,
+                                          limit, unused, attributes,
+                                          conditions or {})
+            return page, time.perf_counter() - started, \
+                self.local.response_size
+
+        executor = ThreadPoolExecutor(max_workers=prefetch + 1)
+        pending = deque()
+        start, limit = 0, page_size
+        try:
+            while True:
+                while len(pending) <= prefetch:
+                    pending.append(
+                        (limit, executor.submit(fetch, start, limit)))
+                    start += limit
+                requested, future = pending.popleft()
+                page, seconds, size = future.result()
+                if isinstance(page, dict):
+                    if str(page.get("status")).startswith(
+                            "No survey participants found"):
+                        return
+                    raise LimeSurveyError("list_participants",
+                                          page.get("status"))
+                if page:
+                    # grow at most by factor 2 per page
+                    limit = int(max(page_size, min(
+                        max_page_size, 2 * limit,
+                        self.PAGE_SECONDS * len(page) / max(seconds, 1e-6),
+                        self.PAGE_BYTES * len(page) / max(size, 1))))
+                for participant in page:
+                    yield participant
+                if len(page) < requested:
+                    return
+        finally:
+            for requested, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def iter_responses(self, survey_id, document_type="json", token=None,
+                       language_code=None, completion_status="all",
+                       heading_type="code", response_type="short",
+                       fields=None, from_response_id=None,
+                       to_response_id=None, session_key=None,
+                       range_size=1000, workers=4):
+        """
+        Iterates over the responses of a survey. Instead of exporting all
+        responses at once, the response ids are split into ranges of
+        range_size responses, which are exported concurrently and decoded
+        while they are consumed, so only about workers ranges are in memory.
+        Without from_response_id and to_response_id, the ranges are computed
+        from an export of the id column.
+
+        :param survey_id: ID of the survey
+        :param document_type: "json" or "csv"
+        :param token: export the responses of this token only, by a single
+            export_responses_by_token call
+        :param language_code: see export_responses
+        :param completion_status: see export_responses
+        :param heading_type: see export_responses
+        :param response_type: see export_responses
+        :param fields: see export_responses
+        :param from_response_id: first response id to export
+        :param to_response_id: last response id to export
+        :param session_key: session key, None for the key of the client
+        :param range_size: number of responses per range. Given from and to
+            response id, number of ids per range, the last range takes the
+            ids which are left over.
+        :param workers: number of ranges exported concurrently
+        :return: generator of the responses as dicts in the order of their id
+        :raise: LimeSurveyError if the server returns an error status
+        """
+        if token is not None:
+            exports = [self.export_responses_by_token(
+                session_key, survey_id, document_type, token, language_code,
+                completion_status, heading_type, response_type, fields)]
+        else:
+            if from_response_id is None or to_response_id is None:
+                ranges = self.get_response_id_ranges(
+                    survey_id, completion_status, from_response_id,
+                    to_response_id, session_key, range_size)
+            else:
+                # the last range takes the ids which are left over
+                count = max((to_response_id - from_response_id + 1) //
+                            range_size, 1)
+                ranges = [(from_response_id + i * range_size,
+                           to_response_id if i == count - 1 else
+                           from_response_id + (i + 1) * range_size - 1)
+                          for i in range(count)]
+            exports = self.map("export_responses", (
+                (session_key, survey_id, document_type, language_code,
+                 completion_status, heading_type, response_type, first, last,
+                 fields) for first, last in ranges), workers=workers)
+
+        for export in exports:
+            if isinstance(export, Exception):
+                raise export
+            if isinstance(export, dict):
+                if str(export.get("status")).startswith(
+                        ("No Data", "No Response found")):
+                    continue
+                raise LimeSurveyError("export_responses",
+                                      export.get("status"))
+            for row in iter_export_rows(export, document_type):
+                yield row
+
+    def get_response_id_ranges(self, survey_id, completion_status="all",
+                               from_response_id=None, to_response_id=None,
+                               session_key=None, range_size=1000):
+        """
+        :return: list of tuples (first, last response id) of ranges with
+            range_size responses, see iter_responses
+        """
+        export = self.export_responses(
+            session_key, survey_id, "json", None, completion_status, "code",
+            "short", from_response_id, to_response_id, ["id"])
+        if isinstance(export, dict):
+            if str(export.get("status")).startswith("No Data"):
+                return []
+            raise LimeSurveyError("export_responses", export.get("status"))
+        ids = sorted(int(row["id"]) for row in iter_export_rows(export, "json"))
+        return [(ids[i], ids[min(i + range_size, len(ids)) - 1])
+                for i in range(0, len(ids), range_size)]
 
     def query(self, method, params):
         """
@@ -28,44 +1208,360 @@ class LimeSurveyClient(object):
         Parameters
         :param method: Name of API method to call.
         :type method: String
-        :param params: Parameters to the specified API call.
+        :param params: Parameters to the specified API call. A
+            "$sSessionKey" None is replaced by the session key of the client,
+            if it has a username.
         :type params: OrderedDict
 
+        With a cache, the results of read methods are taken from the cache
+        and write methods invalidate the cached results, see
+        lsrc2extras.ResultCache.
+
         Return
-        :return: result of API call
+        :return: result of API call, or a Future of it inside a batch
         :raise: requests.ConnectionError
         :raise: LimeSurveyError if the API returns an error (either http error
             or error message in body)
         """
+        session_key = None
+        if self.username is not None and "$sSessionKey" in params and \
+                params["$sSessionKey"] is None:
+            session_key = self.get_current_session_key()
+            params = OrderedDict(params)
+            params["$sSessionKey"] = session_key
+
+        kind = self._RC2_METHOD_KINDS.get(method)
+        cache = self.cache
+        invalidate = cache is not None and kind == "write"
+        batch = getattr(self.local, "batch", None)
+        if batch is not None:
+            future = batch.add(method, params)
+            if invalidate:
+                future.add_done_callback(lambda f: cache.invalidate(params))
+            return future
+        if cache is not None and kind == "read" and \
+                method not in cache.VOLATILE_METHODS:
+            key = self.get_cache_key(method, params)
+            content = cache.get(key)
+            if content is not None:
+                return self.codec.loads(content)
+            generation = cache.generation
+        else:
+            key = None
+
+        try:
+            result = self.send_retrying(method, params, kind == "read")
+            if session_key is not None and self.is_invalid_session(result):
+                params["$sSessionKey"] = self.get_current_session_key(
+                    invalid_key=session_key)
+                result = self.send_retrying(method, params, kind == "read")
+        finally:
+            if invalidate:
+                cache.invalidate(params)
+        # status dicts are errors, e.g. "No permission"
+        if key is not None and not (isinstance(result, dict) and
+                                    "status" in result):
+            cache.set(key, self.codec.dumps(result), params, result,
+                      generation)
+        return result
+
+    def get_cache_key(self, method, params):
+        """
+        :return: key of a call in the cache, independent of the session key
+        """
+        values = [value for name, value in params.items()
+                  if name != "$sSessionKey"]
+        return method, self.codec.dumps(values)
+
+    def send_retrying(self, method, params, retry):
+        """
+        Sends a single call and repeats it after temporary errors, see
+        retries in __init__.
+        :param retry: True if the call may be repeated
+        :return: result of API call
+        """
+        for attempt in itertools.count():
+            try:
+                return self.send(method, params, self.get_request_id())
+            except (requests.ConnectionError, requests.Timeout,
+                    LimeSurveyError) as e:
+                if not retry or attempt >= self.retries or \
+                        not self.is_temporary_error(e):
+                    raise
+            time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    @staticmethod
+    def is_temporary_error(error):
+        """
+        :param error: exception raised by send
+        :return: True if repeating the call may succeed
+        """
+        if not isinstance(error, LimeSurveyError):
+            return True
+        # LimeSurveyError(method, "Not response.ok", status, content)
+        return error.args[1:2] == ("Not response.ok",) and \
+            (error.args[2] == 429 or error.args[2] >= 500)
+
+    def post(self, body, stream=False, headers=None):
+        """
+        Posts a request, within the limit of the limiter.
+        :param body: serialized request, or an iterable of its chunks
+        :param stream: if True, the content is read when it is accessed
+        :param headers: headers of the request, defaults to self.headers
+        :return: requests.Response
+        """
+        headers = headers or self.headers
+        if self.limiter is None:
+            return self.session.post(self.url, headers=headers,
+                                     data=body, timeout=self.timeout,
+                                     stream=stream)
+        start = self.limiter.acquire()
+        failed = True
+        try:
+            response = self.session.post(self.url, headers=headers,
+                                         data=body, timeout=self.timeout,
+                                         stream=stream)
+            failed = response.status_code == 429 or \
+                response.status_code >= 500
+            return response
+        finally:
+            self.limiter.release(start, failed)
+
+    def send(self, method, params, request_id):
+        """
+        Sends a single call, see query.
+        :param request_id: id the response has to answer
+        :return: result of API call
+        """
+        stats = self.start_stats(method, params)
+        if stats is not None:
+            start = time.perf_counter()
+            try:
+                result = self.send_request(method, params, request_id, stats)
+            except BaseException as e:
+                self.finish_stats(stats, start, e)
+                raise
+            self.finish_stats(stats, start)
+            return result
+        return self.send_request(method, params, request_id)
+
+    def send_request(self, method, params, request_id, stats=None):
+        """
+        :param stats: CallStats to fill in, or None
+        :return: result of API call, see send
+        """
         # 1. Prepare the request data
         data = OrderedDict([
             ("method", method),
             ("params", params),
-            ("id", 1)  # Possibly a request id for parallel use cases.
+            ("id", request_id)
         ])
-        data_json = json.dumps(data)
+        if stats is None:
+            body = self.codec.dumps(data)
+        else:
+            body = self.encode(data, stats)
 
         # 2. Query the API
-        response = requests.post(self.url, headers=self.headers, json=data)
+        response = self.post(body)
+        return self.read_response(method, response, request_id, stats)
 
+    def read_response(self, method, response, request_id, stats=None):
+        """
+        :param response: requests.Response of a single call
+        :param request_id: id the response has to answer
+        :param stats: CallStats to fill in, or None
+        :return: result of API call, see send
+        """
         if not response.ok:
             raise LimeSurveyError(
                 method, "Not response.ok", response.status_code,
                 response.content)
 
-        if not 0 < len(response.content):
+        content = response.content
+        if not 0 < len(content):
             raise LimeSurveyError(
                 method, "Not 0 < len(response.content)",
-                response.status_code, response.content)
+                response.status_code, content)
 
-        response_data = response.json()
+        # size of the last response of this thread, see iter_participants
+        self.local.response_size = len(content)
+        if stats is None:
+            response_data = self.codec.loads(content)
+        else:
+            response_data = self.decode(content, stats)
 
         try:
             return_value = response_data.get("result")
         except KeyError:
             raise LimeSurveyError(
                 method, "Key 'result' not in response json",
-                response.status_code, response.content)
+                response.status_code, content)
+
+        if response_data.get("id", request_id) != request_id:
+            raise LimeSurveyError(
+                method, "Response to another request id",
+                response_data.get("id"), request_id)
 
         return return_value
+
+    def send_streaming(self, method, params, open_string, chunk_size=65536):
+        """
+        Sends a single call and parses the response while it is received,
+        see JsonStreamParser. Hooks and retries don't apply.
+        :param open_string: see JsonStreamParser, the paths start with
+            "result"
+        :param chunk_size: number of bytes read at once
+        :return: result of API call
+        """
+        request_id = self.get_request_id()
+        body = self.codec.dumps(OrderedDict([
+            ("method", method),
+            ("params", params),
+            ("id", request_id)
+        ]))
+        with self.post(body, stream=True) as response:
+            if not response.ok:
+                raise LimeSurveyError(
+                    method, "Not response.ok", response.status_code,
+                    response.content)
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            response_data = JsonStreamParser(
+                (decoder.decode(chunk)
+                 for chunk in response.iter_content(chunk_size)),
+                open_string).parse()
+
+        if not isinstance(response_data, dict):
+            raise LimeSurveyError(method, "Unexpected response",
+                                  response.status_code)
+        if response_data.get("id", request_id) != request_id:
+            raise LimeSurveyError(
+                method, "Response to another request id",
+                response_data.get("id"), request_id)
+        return response_data.get("result")
+
+    def query_batch(self, calls):
+        """
+        Sends several calls as one JSON-RPC batch. If the server rejects the
+        batch with a JSON-RPC error, the calls are sent as concurrent single
+        requests. Any other failure is set on all futures, the calls are not
+        repeated, as they may have been executed.
+        :param calls: list of tuples (request id, method, params, future),
+            the results or errors are set on the futures
+        """
+        calls = [call for call in calls
+                 if call[3].set_running_or_notify_cancel()]
+        if not calls:
+            return
+        if self.batch_supported is not False:
+            try:
+                responses = self.send_batch(calls)
+            except Exception as e:
+                for call in calls:
+                    call[3].set_exception(e)
+                return
+            if responses is not None:
+                self.batch_supported = True
+                by_id = dict((r.get("id"), r) for r in responses
+                             if isinstance(r, dict))
+                for request_id, method, params, future in calls:
+                    if request_id in by_id:
+                        future.set_result(by_id[request_id].get("result"))
+                    else:
+                        future.set_exception(LimeSurveyError(
+                            method, "No response for request id",
+                            request_id))
+                return
+            self.batch_supported = False
+
+        executor = self.get_executor()
+        for call in calls:
+            executor.submit(self.send_into_future, *call)
+
+    def get_executor(self):
+        """
+        :return: thread pool of pool_size threads, created on first use
+        """
+        with self.executor_lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.pool_size)
+            return self.executor
+
+    def send_batch(self, calls):
+        """
+        :param calls: list of tuples (request id, method, params, future)
+        :return: list of responses, None if the server rejected the batch
+            with a JSON-RPC error, i.e. it does not accept batches
+        :raise: requests.RequestException
+        :raise: LimeSurveyError for other answers (e.g. http errors), as it
+            is not known whether the calls were executed
+        """
+        stats = self.start_stats("batch", [call[:3] for call in calls])
+        if stats is not None:
+            start = time.perf_counter()
+            try:
+                responses = self.send_batch_request(calls, stats)
+            except BaseException as e:
+                self.finish_stats(stats, start, e)
+                raise
+            self.finish_stats(stats, start)
+            return responses
+        return self.send_batch_request(calls)
+
+    def send_batch_request(self, calls, stats=None):
+        """
+        :param stats: CallStats to fill in, or None
+        :return: list of responses or None, see send_batch
+        """
+        data = [OrderedDict([("method", method), ("params", params),
+                             ("id", request_id)])
+                for request_id, method, params, future in calls]
+        if stats is None:
+            body = self.codec.dumps(data)
+        else:
+            body = self.encode(data, stats)
+        response = self.post(body)
+        if not response.ok:
+            raise LimeSurveyError(
+                "batch", "Not response.ok", response.status_code,
+                response.content)
+        if not 0 < len(response.content):
+            raise LimeSurveyError(
+                "batch", "Not 0 < len(response.content)",
+                response.status_code, response.content)
+        if stats is None:
+            responses = self.codec.loads(response.content)
+        else:
+            responses = self.decode(response.content, stats)
+        if isinstance(responses, list):
+            return responses
+        if isinstance(responses, dict) and responses.get("error"):
+            return None
+        raise LimeSurveyError("batch", "Unexpected response",
+                              response.status_code, response.content)
+
+    def encode(self, data, stats):
+        """
+        :return: self.codec.dumps(data), measured in stats
+        """
+        start = time.perf_counter()
+        body = self.codec.dumps(data)
+        stats.encode_seconds = time.perf_counter() - start
+        stats.request_bytes = len(body)
+        return body
+
+    def decode(self, content, stats):
+        """
+        :return: self.codec.loads(content), measured in stats
+        """
+        start = time.perf_counter()
+        data = self.codec.loads(content)
+        stats.decode_seconds = time.perf_counter() - start
+        stats.response_bytes = len(content)
+        return data
+
+    def send_into_future(self, request_id, method, params, future):
+        try:
+            future.set_result(self.send(method, params, request_id))
+        except BaseException as e:
+            future.set_exception(e)
 #METHODSPLACEHOLDER
\ No newline at end of file
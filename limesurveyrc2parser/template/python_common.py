@@ -0,0 +1,47 @@
+class LimeSurveyError(Exception):
+    """Base class for exceptions in LimeSurvey."""
+    def __init__(self, method, *args):
+        base_err = "Error during query"
+        message = [base_err, method]
+        if args is not None:
+            message += [str(x) for x in args]
+        self.message = " | ".join(message)
+
+class JsonCodec(object):
+    """Serializes requests and decodes responses with the json module."""
+    def dumps(self, data):
+        """
+        :param data: JSON serializable data
+        :return: UTF-8 encoded JSON
+        """
+        return json.dumps(data).encode("utf-8")
+
+    def loads(self, content):
+        """
+        :param content: JSON as bytes
+        :return: decoded data
+        """
+        return json.loads(content)
+
+class OrjsonCodec(JsonCodec):
+    """Faster codec based on the orjson package."""
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+
+    def dumps(self, data):
+        # dict keys which aren't strings are converted like by json.dumps
+        return self.orjson.dumps(data, option=self.orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, content):
+        return self.orjson.loads(content)
+
+def get_default_codec():
+    """
+    :return: OrjsonCodec if orjson is installed, otherwise JsonCodec
+    """
+    try:
+        return OrjsonCodec()
+    except ImportError:
+        return JsonCodec()
+
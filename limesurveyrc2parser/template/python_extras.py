@@ -0,0 +1,458 @@
+import itertools
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+#CLIENTIMPORTPLACEHOLDER
+
+class ResultCache(object):
+    """
+    LRU cache with time to live for the results of the read methods of a
+    LimeSurveyClient, keyed by method and parameters. Every entry is tagged
+    with the surveys, groups and questions of its parameters; a write
+    method removes the entries of the objects it changes:
+
+        client = LimeSurveyClient(url, cache=ResultCache(ttl=300))
+
+    Reads of no particular object (e.g. list_surveys) are tagged with
+    ALL_TAG and removed by every write. The survey of a group or question is
+    learnt from calls with both ids and from the results of list_groups and
+    list_questions. A write to a group or question of an unknown survey, or
+    to no particular object (e.g. import_survey), clears the cache.
+    """
+    # parameters identifying the objects a call reads or writes
+    TAG_PARAMETERS = (("$iSurveyID", "survey"), ("$iGroupID", "group"),
+                      ("$iQuestionID", "question"))
+    # tag of the entries of reads of no particular object
+    ALL_TAG = ("all", None)
+    # read methods of data changed by participants, not by API calls
+    VOLATILE_METHODS = frozenset([
+        "get_participant_properties", "get_response_ids", "get_summary",
+        "get_uploaded_files", "list_participants"])
+
+    def __init__(self, max_size=1024, ttl=60.0):
+        """
+        :param max_size: maximum number of entries
+        :param ttl: seconds an entry is valid
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        # key -> (expiry time, encoded result, tags), least recently used
+        # first
+        self.entries = OrderedDict()
+        # tag -> keys of the entries with the tag
+        self.keys_by_tag = {}
+        # ("group" or "question", id) -> survey id
+        self.surveys = {}
+        # incremented by every invalidation, a result read before it is not
+        # stored, see set
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get_tags(self, params):
+        """
+        :param params: parameters of a call
+        :return: set of tags (kind, id as string) of the objects of the
+            call. A group or question is tagged with its survey as well, if
+            it is known, otherwise with ("survey", None).
+        """
+        tags = set()
+        ids = dict((kind, str(params[name]))
+                   for name, kind in self.TAG_PARAMETERS
+                   if params.get(name) is not None)
+        survey_id = ids.get("survey")
+        for kind, object_id in ids.items():
+            tags.add((kind, object_id))
+            if kind != "survey":
+                if survey_id is not None:
+                    self.surveys[kind, object_id] = survey_id
+                tags.add(("survey", self.surveys.get((kind, object_id))))
+        return tags
+
+    def learn(self, result):
+        """
+        Records the surveys of the groups and questions of a result.
+        :param result: result of a read method
+        """
+        if not isinstance(result, list):
+            return
+        for item in result:
+            if isinstance(item, dict) and item.get("sid") is not None:
+                for kind, key in (("group", "gid"), ("question", "qid")):
+                    if item.get(key) is not None:
+                        self.surveys[kind, str(item[key])] = str(item["sid"])
+
+    def get(self, key):
+        """
+        :param key: key of the call, see LimeSurveyClient.get_cache_key
+        :return: encoded result or None if it is not cached
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self.remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, content, params, result, generation):
+        """
+        :param key: key of the call
+        :param content: encoded result
+        :param params: parameters of the call
+        :param result: result of the call
+        :param generation: generation before the call was sent, the result
+            is dropped if a write invalidated the cache since
+        """
+        with self.lock:
+            self.learn(result)
+            tags = self.get_tags(params) or set([self.ALL_TAG])
+            if generation != self.generation:
+                return
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, content, tags)
+            for tag in tags:
+                self.keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_size:
+                self.remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        _, _, tags = self.entries.pop(key)
+        for tag in tags:
+            keys = self.keys_by_tag[tag]
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_tag[tag]
+
+    def invalidate(self, params=None):
+        """
+        Removes the entries of the objects of a write.
+        :param params: parameters of the write, None to clear the cache
+        """
+        with self.lock:
+            self.generation += 1
+            tags = set() if params is None else self.get_tags(params)
+            if not tags or ("survey", None) in tags:
+                self.entries.clear()
+                self.keys_by_tag.clear()
+                return
+            # the entries of groups and questions of unknown surveys may
+            # belong to the surveys as well, lists of all objects contain them
+            tags.add(("survey", None))
+            tags.add(self.ALL_TAG)
+            for tag in tags:
+                for key in list(self.keys_by_tag.get(tag, ())):
+                    self.remove(key)
+
+class ConcurrencyLimiter(object):
+    """
+    Limits the number of calls in flight of the threads sharing a client
+    with additive increase, multiplicative decrease (AIMD): the limit grows
+    by one per limit calls completed in time and is cut by backoff when a
+    call fails or takes more than latency_factor times the usual latency.
+
+        client = LimeSurveyClient(url, limiter=ConcurrencyLimiter())
+
+    The usual latency is the lowest latency seen, which follows higher
+    latencies slowly, so a server which became slower for good is not
+    throttled forever.
+    """
+    def __init__(self, initial=4, minimum=1, maximum=32, latency_factor=2.0,
+                 backoff=0.5):
+        """
+        :param initial: number of calls in flight at the start
+        :param minimum: lowest limit
+        :param maximum: highest limit
+        :param latency_factor: a call slower than latency_factor times the
+            usual latency decreases the limit
+        :param backoff: factor the limit is multiplied with to decrease it
+        """
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_factor = latency_factor
+        self.backoff = backoff
+        self.in_flight = 0
+        # usual latency in seconds, None before the first call
+        self.latency = None
+        # time of the last decrease, calls started before don't decrease the
+        # limit again
+        self.decreased_at = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Waits until a call may be sent.
+        :return: start time of the call, to be passed to release
+        """
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+        return time.monotonic()
+
+    def release(self, start, failed=False):
+        """
+        :param start: result of acquire
+        :param failed: True if the server failed or is overloaded
+        """
+        now = time.monotonic()
+        latency = now - start
+        with self.condition:
+            self.in_flight -= 1
+            if not failed:
+                if self.latency is None or latency < self.latency:
+                    self.latency = latency
+                else:
+                    self.latency += (latency - self.latency) * 0.01
+            if failed or latency > self.latency * self.latency_factor:
+                if start >= self.decreased_at:
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self.decreased_at = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+class ClientMetrics(object):
+    """
+    Per method metrics of the requests of a LimeSurveyClient: number of
+    calls and errors, latency histogram, bytes sent and received and time
+    spent encoding and decoding JSON.
+
+        metrics = ClientMetrics()
+        client.add_hooks(after=metrics.record)
+        print(metrics.to_prometheus())
+    """
+    # upper bounds of the latency histogram buckets in seconds
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+               float("inf"))
+
+    # counters of to_prometheus: name -> (key in to_dict, help)
+    COUNTERS = OrderedDict([
+        ("lsrc2_calls_total", ("calls", "Number of requests")),
+        ("lsrc2_errors_total", ("errors", "Number of failed requests")),
+        ("lsrc2_request_bytes_total",
+         ("request_bytes", "Bytes of the request bodies")),
+        ("lsrc2_response_bytes_total",
+         ("response_bytes", "Bytes of the response bodies")),
+        ("lsrc2_encode_seconds_total",
+         ("encode_seconds", "Time spent encoding requests")),
+        ("lsrc2_decode_seconds_total",
+         ("decode_seconds", "Time spent decoding responses")),
+    ])
+
+    def __init__(self):
+        # method -> dict of the metrics, see to_dict
+        self.methods = {}
+        self.lock = threading.Lock()
+
+    def record(self, stats):
+        """
+        Adds the measurements of a request, an after hook.
+        :param stats: CallStats
+        """
+        with self.lock:
+            metrics = self.methods.get(stats.method)
+            if metrics is None:
+                metrics = self.methods[stats.method] = OrderedDict([
+                    ("calls", 0), ("errors", 0), ("request_bytes", 0),
+                    ("response_bytes", 0), ("encode_seconds", 0.0),
+                    ("decode_seconds", 0.0), ("seconds", 0.0),
+                    ("buckets", [0] * len(self.BUCKETS))])
+            metrics["calls"] += 1
+            if stats.error is not None:
+                metrics["errors"] += 1
+            metrics["request_bytes"] += stats.request_bytes
+            metrics["response_bytes"] += stats.response_bytes
+            metrics["encode_seconds"] += stats.encode_seconds
+            metrics["decode_seconds"] += stats.decode_seconds
+            metrics["seconds"] += stats.seconds
+            buckets = metrics["buckets"]
+            for i, bound in enumerate(self.BUCKETS):
+                if stats.seconds <= bound:
+                    buckets[i] += 1
+                    break
+
+    def to_dict(self):
+        """
+        :return: dict method -> dict with "calls", "errors",
+            "request_bytes", "response_bytes", "encode_seconds",
+            "decode_seconds", "seconds" (sum of the latencies) and "buckets"
+            (number of calls per latency bucket, see BUCKETS)
+        """
+        with self.lock:
+            return OrderedDict(
+                (method, OrderedDict(
+                    (key, list(value) if key == "buckets" else value)
+                    for key, value in self.methods[method].items()))
+                for method in sorted(self.methods))
+
+    def to_prometheus(self):
+        """
+        :return: metrics in the Prometheus text format, the latency as
+            histogram lsrc2_request_seconds
+        """
+        metrics = self.to_dict()
+        lines = []
+        for name, (key, help_text) in self.COUNTERS.items():
+            lines += ["# HELP %s %s" % (name, help_text),
+                      "# TYPE %s counter" % name]
+            lines += ['%s{method="%s"} %s' % (name, method, m[key])
+                      for method, m in metrics.items()]
+        name = "lsrc2_request_seconds"
+        lines += ["# HELP %s Latency of the requests" % name,
+                  "# TYPE %s histogram" % name]
+        for method, m in metrics.items():
+            count = 0
+            for bound, bucket in zip(self.BUCKETS, m["buckets"]):
+                count += bucket
+                lines.append('%s_bucket{method="%s",le="%s"} %d' % (
+                    name, method, "+Inf" if bound == float("inf") else bound,
+                    count))
+            lines += ['%s_sum{method="%s"} %s' % (name, method, m["seconds"]),
+                      '%s_count{method="%s"} %d' % (name, method, count)]
+        return "\n".join(lines) + "\n"
+
+class ResponseSync(object):
+    """
+    Copies the responses of surveys into a SQLite database. A run exports
+    only the responses newer than the last one, so a survey without new
+    responses costs a single get_summary call:
+
+        with ResponseSync(client, "responses.sqlite") as sync:
+            sync.sync(survey_id)
+
+    The responses are stored as JSON in the table responses (survey_id, id,
+    submitdate, datestamp, data). Responses which were incomplete are
+    exported again when the number of completed responses changed. Edited
+    responses are found within the recheck window only.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sync_state (
+            survey_id INTEGER PRIMARY KEY,
+            max_id INTEGER NOT NULL,
+            full_responses INTEGER,
+            completed_responses INTEGER);
+        CREATE TABLE IF NOT EXISTS responses (
+            survey_id INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            submitdate TEXT,
+            datestamp TEXT,
+            data TEXT NOT NULL,
+            PRIMARY KEY (survey_id, id));
+    """
+
+    def __init__(self, client, path, session_key=None, recheck_seconds=None,
+                 batch_size=1000, range_size=1000, workers=4):
+        """
+        :param client: LimeSurveyClient
+        :param path: path of the SQLite database
+        :param session_key: session key, None for the key of the client
+        :param recheck_seconds: responses with a datestamp within this many
+            seconds before the run (in the time zone of the server) are
+            exported again to get their changes, None to disable
+        :param batch_size: number of responses stored per transaction
+        :param range_size: see LimeSurveyClient.iter_responses
+        :param workers: see LimeSurveyClient.iter_responses
+        """
+        self.client = client
+        self.session_key = session_key
+        self.recheck_seconds = recheck_seconds
+        self.batch_size = batch_size
+        self.range_size = range_size
+        self.workers = workers
+        self.db = sqlite3.connect(path)
+        self.db.executescript(self.SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def get_state(self, survey_id):
+        """
+        :return: tuple (max_id, full_responses, completed_responses) of the
+            last run, (0, None, None) before the first one
+        """
+        row = self.db.execute(
+            "SELECT max_id, full_responses, completed_responses "
+            "FROM sync_state WHERE survey_id = ?", (survey_id,)).fetchone()
+        return row or (0, None, None)
+
+    def get_first_id(self, survey_id, max_id, completed_changed):
+        """
+        :return: first response id to export
+        """
+        first_ids = [max_id + 1]
+        if completed_changed:
+            first_ids.append(self.db.execute(
+                "SELECT MIN(id) FROM responses WHERE survey_id = ? AND "
+                "submitdate IS NULL", (survey_id,)).fetchone()[0])
+        if self.recheck_seconds is not None:
+            since = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(
+                time.time() - self.recheck_seconds))
+            first_ids.append(self.db.execute(
+                "SELECT MIN(id) FROM responses WHERE survey_id = ? AND "
+                "datestamp >= ?", (survey_id, since)).fetchone()[0])
+        return min(i for i in first_ids if i is not None)
+
+    def sync(self, survey_id):
+        """
+        Stores the new and changed responses of a survey.
+        :param survey_id: ID of the survey
+        :return: number of responses stored
+        :raise: LimeSurveyError if the server returns an error status
+        """
+        summary = self.client.get_summary(self.session_key, survey_id, "all")
+        if summary == []:
+            # neither responses nor tokens table: PHP's empty array
+            return 0
+        if not isinstance(summary, dict) or "status" in summary:
+            raise LimeSurveyError("get_summary", summary)
+        if "full_responses" not in summary:
+            # no responses table
+            return 0
+        full = int(summary["full_responses"])
+        completed = int(summary["completed_responses"])
+        max_id, last_full, last_completed = self.get_state(survey_id)
+        first_id = self.get_first_id(survey_id, max_id,
+                                     completed != last_completed)
+        if full == last_full and completed == last_completed and \
+                first_id > max_id:
+            return 0
+
+        count = 0
+        rows = self.client.iter_responses(
+            survey_id, "json", from_response_id=first_id,
+            session_key=self.session_key, range_size=self.range_size,
+            workers=self.workers)
+        while True:
+            batch = [(survey_id, int(row["id"]), row.get("submitdate"),
+                      row.get("datestamp"), json.dumps(row))
+                     for row in itertools.islice(rows, self.batch_size)]
+            with self.db:
+                if batch:
+                    self.db.executemany(
+                        "INSERT OR REPLACE INTO responses (survey_id, id, "
+                        "submitdate, datestamp, data) VALUES (?, ?, ?, ?, ?)",
+                        batch)
+                    max_id = max(max_id, batch[-1][1])
+                    count += len(batch)
+                # the numbers of responses are stored with the last batch
+                done = len(batch) < self.batch_size
+                self.db.execute(
+                    "INSERT OR REPLACE INTO sync_state (survey_id, max_id, "
+                    "full_responses, completed_responses) VALUES "
+                    "(?, ?, ?, ?)", (survey_id, max_id,
+                                     full if done else last_full,
+                                     completed if done else last_completed))
+            if done:
+                return count
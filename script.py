@@ -1,7 +1,14 @@
 # -*- coding: utf-8 -*-
+import argparse
+import json
+import os
 import requests
 import limesurveyrc2parser as pkg
 
+# directory of the parse cache of lsrc2generatepy, set the environment
+# variable LSRC2_CACHE_DIR to an empty string to disable the cache
+CACHE_DIR = os.environ.get("LSRC2_CACHE_DIR", ".lsrc2cache")
+
 
 def download():
     print("Download the PHP source for the remote control API.")
@@ -17,15 +24,68 @@ def download():
 
 
 def generate_python_code():
+    parser = argparse.ArgumentParser(
+        description="Generate lsrc2client.py from lsrc2source.php in the "
+                    "current directory.")
+    parser.add_argument("--compact", action="store_true",
+                        help="generate a compact client, which builds the "
+                             "methods of the RC2 functions on first use")
+    parser.add_argument("--async", dest="asynchronous", action="store_true",
+                        help="generate the asyncio client "
+                             "AsyncLimeSurveyClient (requires aiohttp) and "
+                             "write it to lsrc2asyncclient.py")
+    args = parser.parse_args()
+
     print("Generate Python client code")
-    print("Read lsrc2source.php from current directory")
-    with open('lsrc2source.php') as f:
-        php_source = f.read()
-    print("Parse lsrc2source.php")
-    parse_result = pkg.LimeSurveyRc2PhpSourceParser.parse(php_source)
+    cache = None
+    if CACHE_DIR:
+        print("Use cache in %s" % CACHE_DIR)
+        cache = pkg.ParseCache(CACHE_DIR)
+    print("Parse lsrc2source.php from current directory")
+    parse_result = list(
+        pkg.LimeSurveyRc2PhpSourceParser.iter_parse('lsrc2source.php',
+                                                    cache=cache))
     print("  - contains %d function definitions." % len(parse_result))
-    print("Generating Python code and writing it to lsrc2client.py")
-    py_source = pkg.LimeSurveyRc2PythonSourceGenerator.generate(parse_result)
-    with open('lsrc2client.py', mode='w') as f:
-        f.write(py_source)
+    path = 'lsrc2asyncclient.py' if args.asynchronous else 'lsrc2client.py'
+    print("Generating Python code and writing it to %s" % path)
+    pkg.LimeSurveyRc2PythonSourceGenerator.generate_to(
+        path, parse_result, cache, compact=args.compact,
+        asynchronous=args.asynchronous)
+    if not args.asynchronous:
+        print("Writing the optional helpers to lsrc2extras.py")
+        pkg.LimeSurveyRc2PythonSourceGenerator.generate_extras_to(
+            'lsrc2extras.py')
+    if cache is not None:
+        print("  - %d cache hits, %d cache misses." % (cache.hits,
+                                                      cache.misses))
     print("Done")
+
+
+def generate_compatibility_matrix():
+    parser = argparse.ArgumentParser(
+        description="Parse the PHP sources of several LimeSurvey versions and "
+                    "show which RC2 methods and parameters exist in which "
+                    "version.")
+    parser.add_argument("sources", nargs="+", metavar="[LABEL=]PATH",
+                        help="PHP sources in chronological order, "
+                             "optionally labeled with the version")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes")
+    parser.add_argument("--json", action="store_true",
+                        help="print the matrix and all changes as JSON")
+    args = parser.parse_args()
+
+    labels, paths = [], []
+    for source in args.sources:
+        label, _, path = source.rpartition("=")
+        labels.append(label or path)
+        paths.append(path)
+    matrix = pkg.LimeSurveyRc2CompatibilityMatrix.from_files(
+        paths, labels, workers=args.workers)
+    if args.json:
+        print(json.dumps(matrix.to_dict(), indent=2))
+        return
+    print(matrix.to_text())
+    print("")
+    for change in matrix.get_changes():
+        print(" | ".join(str(v) for v in change.values() if v is not None))
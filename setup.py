@@ -16,10 +16,15 @@ setup(
         "requests",
         "pydash"
     ],
+    extras_require={
+        # asyncio client generated by lsrc2generatepy --async
+        "async": ["aiohttp"]
+    },
     entry_points={
         "console_scripts": [
             "lsrc2download=script:download",
-            "lsrc2generatepy=script:generate_python_code"
+            "lsrc2generatepy=script:generate_python_code",
+            "lsrc2compat=script:generate_compatibility_matrix"
         ]
     },
     keywords="limesurvey api remote control parser",
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for a LimeSurvey RC2 server and helper to import the client
+generated from the real PHP source.
+"""
+import gzip
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .context import limesurveyrc2parser as pkg
+
+_client_modules = {}
+
+
+def load_client_module(compact=False, asynchronous=False):
+    """
+    Generates the client from resource/lsrc2source.php once and imports it.
+    :param compact: generate the compact client
+    :param asynchronous: generate the asyncio client
+    :return: module of the generated client
+    """
+    key = (compact, asynchronous)
+    if key not in _client_modules:
+        parse_result = list(pkg.LimeSurveyRc2PhpSourceParser.iter_parse(
+            os.path.join(os.path.dirname(__file__), "resource",
+                         "lsrc2source.php")))
+        path = os.path.join(tempfile.mkdtemp(), "lsrc2client.py")
+        pkg.LimeSurveyRc2PythonSourceGenerator.generate_to(
+            path, parse_result, compact=compact, asynchronous=asynchronous)
+        spec = importlib.util.spec_from_file_location("lsrc2client", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _client_modules[key] = module
+    return _client_modules[key]
+
+
+def load_extras_module():
+    """
+    Generates the module of the optional helpers for the client of
+    load_client_module() once and imports it.
+    :return: module of the helpers
+    """
+    if "extras" not in _client_modules:
+        client_module = load_client_module()
+        path = os.path.join(os.path.dirname(client_module.__file__),
+                            "lsrc2extras.py")
+        pkg.LimeSurveyRc2PythonSourceGenerator.generate_extras_to(
+            path, "lsrc2client")
+        spec = importlib.util.spec_from_file_location("lsrc2extras", path)
+        module = importlib.util.module_from_spec(spec)
+        # the helpers import the client module by name
+        sys.modules["lsrc2client"] = client_module
+        try:
+            spec.loader.exec_module(module)
+        finally:
+            del sys.modules["lsrc2client"]
+        _client_modules["extras"] = module
+    return _client_modules["extras"]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are sent separately, don't wait for the ACK in between
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+                if not size:
+                    break
+            body = b"".join(chunks)
+        else:
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        request = json.loads(body.decode("utf-8"))
+        with self.server.lock:
+            self.server.requests.append(request)
+        response = self.server.respond(request)
+        if isinstance(response, tuple):
+            status, data = response
+        else:
+            status, data = 200, json.dumps(response).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    JSON-RPC server answering every call with the result of
+    methods[method](*params). Usable as context manager, which starts the
+    server in a thread.
+    """
+    daemon_threads = True
+
+    def __init__(self, methods=None, batch=True):
+        """
+        :param methods: dict method name -> function
+        :param batch: answer batch requests, otherwise they get an error like
+           by LimeSurvey
+        """
+        ThreadingHTTPServer.__init__(self, ("127.0.0.1", 0), StandInHandler)
+        self.methods = methods or {}
+        self.batch = batch
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = []
+        self.url = "http://127.0.0.1:%d/remotecontrol" % self.server_port
+
+    def respond(self, request):
+        """
+        :param request: decoded JSON-RPC request
+        :return: response data or tuple (HTTP status, body)
+        """
+        if isinstance(request, list):
+            if not self.batch:
+                return {"id": None, "result": None,
+                        "error": "Invalid request"}
+            return [self.respond(r) for r in request]
+        method = self.methods.get(request["method"])
+        if method is None:
+            return {"id": request["id"], "result": None,
+                    "error": "Method not found"}
+        return {"id": request["id"], "error": None,
+                "result": method(*request["params"].values())}
+
+    def handle_error(self, request, client_address):
+        # clients closing the connection (e.g. after a timeout) are expected
+        pass
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import os
+from .context import limesurveyrc2parser as pkg
+
+Parser = pkg.LimeSurveyRc2PhpSourceParser
+SourceGenerator = pkg.LimeSurveyRc2PythonSourceGenerator
+
+
+class TestParseCache(object):
+
+    def test_rerun_uses_cache(self, tmpdir, monkeypatch):
+        """
+        A second run with an unchanged source doesn't parse or generate any
+        function again and returns the same Python code.
+        :return:
+        """
+        with open('resource/lsrc2source.php') as f:
+            php_source = f.read()
+        cache = pkg.ParseCache(str(tmpdir))
+        py_source = SourceGenerator.generate(Parser.parse(php_source, cache),
+                                             cache)
+        assert cache.hits == 0
+        assert len(os.listdir(str(tmpdir))) == 45
+
+        def fail(*args):
+            raise AssertionError("cached function was parsed or generated")
+        monkeypatch.setattr(Parser, "get_function_description", fail)
+        monkeypatch.setattr(SourceGenerator, "get_fct", fail)
+        cache = pkg.ParseCache(str(tmpdir))
+        parse_result = Parser.parse(php_source, cache)
+        assert SourceGenerator.generate(parse_result, cache) == py_source
+        assert cache.misses == 0
+
+    def test_changed_function(self, tmpdir):
+        php_source = """
+    /**
+    * fct1doc
+    */
+    public function fct1($iStart=1)
+    {
+    }
+
+    /**
+    * fct2doc
+    */
+    public function fct2($iStart=1)
+    {
+    }"""
+        Parser.parse(php_source, pkg.ParseCache(str(tmpdir)))
+        cache = pkg.ParseCache(str(tmpdir))
+        r = Parser.parse(php_source.replace("fct2doc", "changed"), cache)
+        assert r[1]["doc"] == "changed"
+        assert (cache.hits, cache.misses) == (1, 1)
+        # a different namespace (package version) doesn't use the entries
+        cache = pkg.ParseCache(str(tmpdir), namespace="other")
+        Parser.parse(php_source, cache)
+        assert (cache.hits, cache.misses) == (0, 2)
+
+    def test_eviction(self, tmpdir):
+        cache = pkg.ParseCache(str(tmpdir), max_size=1000)
+        for i in range(20):
+            cache.set("key%d" % i, "method", "x" * 100)
+        assert cache.size <= 1000
+        assert sum(os.path.getsize(os.path.join(str(tmpdir), name))
+                   for name in os.listdir(str(tmpdir))) == cache.size
+        # the most recently used entry is kept
+        assert pkg.ParseCache(str(tmpdir)).get("key19", "method") == "x" * 100
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from .context import limesurveyrc2parser as pkg
+
+Matrix = pkg.LimeSurveyRc2CompatibilityMatrix
+
+V1 = """
+    /**
+    * doc
+    */
+    public function list_surveys($sSessionKey, $sUsername=NULL)
+    {
+    }
+
+    /**
+    * doc
+    */
+    public function get_summary($sSessionKey, $iSurveyID, $sStatName='all')
+    {
+    }
+"""
+
+V2 = """
+    /**
+    * doc
+    */
+    public function get_summary($sSessionKey, $sStatName='none', $iSurveyID)
+    {
+    }
+
+    /**
+    * doc
+    */
+    public function list_users($sSessionKey, $uid=FALSE)
+    {
+    }
+"""
+
+
+class TestCompatibilityMatrix(object):
+
+    def test_changes(self):
+        matrix = Matrix()
+        matrix.add("1.0", pkg.LimeSurveyRc2PhpSourceParser.parse(V1))
+        matrix.add("2.0", pkg.LimeSurveyRc2PhpSourceParser.parse(V2))
+        changes = [(c["method"], c["change"], c["version"],
+                    c.get("parameter"), c.get("previous"), c.get("current"))
+                   for c in matrix.get_changes()]
+        assert changes == [
+            ("get_summary", "default_changed", "2.0", "stat_name",
+             "all", "none"),
+            ("get_summary", "order_changed", "2.0", None,
+             ["session_key", "survey_id", "stat_name"],
+             ["session_key", "stat_name", "survey_id"]),
+            ("list_surveys", "method_removed", "2.0", None, None, None),
+            ("list_users", "method_added", "2.0", None, None, None)]
+        d = matrix.to_dict()
+        assert d["methods"]["get_summary"]["versions"] == ["1.0", "2.0"]
+        assert d["methods"]["list_users"]["parameters"] == {
+            "session_key": ["2.0"], "uid": ["2.0"]}
+
+    def test_from_files(self, tmpdir):
+        paths = []
+        for i, php_source in enumerate((V1, V2, V1)):
+            path = tmpdir.join("v%d.php" % i)
+            path.write(php_source)
+            paths.append(str(path))
+        matrix = Matrix.from_files(paths, ["a", "b", "c"], workers=2)
+        assert matrix.versions == ["a", "b", "c"]
+        assert matrix.to_text().split("\n")[:4] == [
+            "             1 2 3",
+            "get_summary  x x x",
+            "list_surveys x - x",
+            "list_users   - x -"]
+        assert [c["change"] for c in matrix.get_changes()
+                if c["method"] == "list_surveys"] == \
+            ["method_removed", "method_added"]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from .context import limesurveyrc2parser as pkg
+
+DocBlock = pkg.PhpDocBlock
+
+
+class TestPhpDocBlock(object):
+
+    def test_parse(self):
+        doc = DocBlock.parse("""Import survey
+
+@access public
+@param string $sSessionKey Auth credentials
+@param string $sImportData String containing the BASE 64 encoded data
+@param string $sImportDataType  lss, csv, txt or lsa
+@return array|integer iSurveyID  - ID of the new survey""")
+        assert doc.text == "Import survey"
+        assert doc.access == "public"
+        assert list(doc.params) == ["$sSessionKey", "$sImportData",
+                                    "$sImportDataType"]
+        assert doc.params["$sImportDataType"] == {
+            "type": "string",
+            "description": "lss, csv, txt or lsa",
+            "line": 5
+        }
+        assert doc.returns["type"] == "array|integer"
+        assert doc.returns["description"] == "iSurveyID  - ID of the new survey"
+        assert doc.tag_lines == {"access": [2], "param": [3, 4, 5],
+                                 "return": [6]}
+
+    def test_get_param_type(self):
+        doc = DocBlock.parse("@param int $iGroupID\n@param $noType")
+        assert doc.get_param_type("$iGroupID") == "int"
+        # prefixes of documented names are not documented
+        assert doc.get_param_type("$iGroup") is None
+        assert doc.get_param_type("$noType") is None
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import sys
+from .context import limesurveyrc2parser as pkg
+
+
+class TestModel(object):
+
+    def test_parameter_dict_access(self):
+        p = pkg.Parameter("$sLanguage", "language", "s", None)
+        assert p["py_name"] == "language"
+        # None is a valid default
+        assert "default" in p and p["default"] is None
+        assert p == {"name": "$sLanguage", "py_name": "language",
+                     "type": "s", "default": None}
+        p = pkg.Parameter("$uid", "uid")
+        # unknown types are None like in the dicts of former versions
+        assert "type" in p and p["type"] is None
+        assert "default" not in p
+        assert sorted(p.keys()) == ["name", "py_name", "type"]
+        assert p.to_dict() == {"name": "$uid", "py_name": "uid", "type": None}
+        p = pkg.LimeSurveyRc2PhpSourceParser.extract_parameters(
+            "$groupIDs=null")[0]
+        assert p["type"] is None and p["default"] is None
+
+    def test_function_description_round_trip(self):
+        r = pkg.LimeSurveyRc2PhpSourceParser.parse("""
+    /**
+    * doc
+    * @param string $sSessionKey
+    */
+    public function list_surveys($sSessionKey, $sUsername=NULL)
+    {
+    }""")
+        fct_desc = r[0]
+        assert fct_desc["docblock"].params["$sSessionKey"]["type"] == "string"
+        d = fct_desc.to_dict()
+        assert sorted(d) == ["doc", "hash", "name", "parameters"]
+        assert d["parameters"][1] == {"name": "$sUsername",
+                                      "py_name": "username",
+                                      "type": "s", "default": None}
+        assert pkg.FunctionDescription.from_dict(d) == fct_desc
+        # names are interned
+        assert fct_desc.parameters[0].py_name is sys.intern("session_key")
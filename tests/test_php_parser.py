@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
+import io
 import json
 from .context import limesurveyrc2parser as pkg
 
 Parser = pkg.LimeSurveyRc2PhpSourceParser
+PhpSourceScanner = pkg.scanner.PhpSourceScanner
 
 
 class TestPhpParser(object):
@@ -99,6 +101,50 @@ class remotecontrol_handle
         assert parsed_function_parameter["default"] == "foo"
         # print(json.dumps(r))
 
+    def test_scan_matches_re(self):
+        """
+        The single pass scanner yields the same doc, name and signature as the
+        RegEx for every documented function of the real PHP source.
+        :return:
+        """
+        with open('resource/lsrc2source.php') as f:
+            php_source = f.read()
+        scanned = [(Parser.clean_doc(doc), name, signature)
+                   for doc, name, signature in Parser.scan(php_source)]
+        matched = [(Parser.clean_doc(doc), name, signature)
+                   for doc, name, signature in
+                   Parser.RE_DOC_PUBLIC_FUNCTION_PARAM.findall(php_source)]
+        assert scanned == matched
+
+    def test_scan_missing_doc(self):
+        """
+        Public functions without a doc comment directly preceding them are
+        yielded without doc.
+        :return:
+        """
+        r = list(Parser.scan("""
+    /**
+    * doc of a property
+    */
+    protected $controller;
+
+    public function fct1($iStart=1)
+    {
+        /** inline doc */
+        return foo($iStart);
+    }
+
+    /**
+    * fct2doc
+    */
+    public function fct2($overrideAll=Array() )
+    {
+    }"""))
+        assert len(r) == 2
+        assert r[0] == (None, "fct1", "$iStart=1")
+        assert r[1][0] == "\n    * fct2doc\n    "
+        assert r[1][1:] == ("fct2", "$overrideAll=Array() ")
+
     def test_extract_parameter_int_default(self):
         r = Parser.extract_parameters("$iStart = 0")
         assert r[0]['name'] == '$iStart'
@@ -112,7 +158,7 @@ class remotecontrol_handle
         assert len(r) == 2
         assert r[0]['name'] == '$overrideAllConditions'
         assert r[0]['py_name'] == 'override_all_conditions'
-        assert 'type' not in r[0]
+        assert r[0]['type'] is None
         assert type(r[0]['default']) == dict
         assert r[1]['name'] == '$iEnd'
 
@@ -175,3 +221,52 @@ class remotecontrol_handle
         expected = "Create and return a session key.\n\nUsing this function you can create a new XML-RPC/JSON-RPC session key.\nThis is mandatory for all following LSRC2 function calls.\n\n* In case of success : Return the session key in string\n* In case of error:\n    * for protocol-level errors (invalid format etc), an error message.\n    * For invalid username and password, returns a null error and the result body contains a 'status' name-value pair with the error message.\n\n@access public\n@param string $username\n@param string $password\n@return string|array"
         clean = Parser.clean_doc(doc)
         assert (clean == expected)
+
+    def test_iter_parse(self):
+        """
+        Parsing the real PHP source in (small) chunks yields the same function
+        descriptions as parsing it at once.
+        :return:
+        """
+        with open('resource/lsrc2source.php') as f:
+            expected = Parser.parse(f.read())
+        for chunk_size in (7, 100, Parser.CHUNK_SIZE):
+            r = list(Parser.iter_parse('resource/lsrc2source.php',
+                                       chunk_size=chunk_size))
+            assert [(d["name"], d["doc"], d["parameters"]) for d in r] == \
+                [(d["name"], d["doc"], d["parameters"]) for d in expected]
+
+    def test_iter_parse_file_objects(self):
+        php_source = """
+    /**
+    * fct1doc äöü
+    */
+    public function fct1($iStart=1)
+    {
+    }
+"""
+        r = list(Parser.iter_parse(io.StringIO(php_source), chunk_size=5))
+        assert len(r) == 1
+        assert r[0]["doc"] == "fct1doc äöü"
+        # binary files are decoded as UTF-8 with universal newlines
+        binary = io.BytesIO(php_source.replace("\n", "\r\n").encode("utf-8"))
+        r = list(Parser.iter_parse(binary, chunk_size=5))
+        assert len(r) == 1
+        assert r[0]["doc"] == "fct1doc äöü"
+        assert r[0]["parameters"][0]["default"] == 1
+
+    def test_scanner_incomplete_token(self):
+        """
+        While a doc comment is incomplete, the chunks are only collected and
+        joined once a chunk may complete the comment.
+        :return:
+        """
+        scanner = PhpSourceScanner()
+        lines = ["* line %d\n" % i for i in range(100)]
+        assert scanner.feed("<?php\n/**\n") == []
+        for line in lines:
+            assert scanner.feed(line) == []
+        assert len(scanner.chunks) == 100
+        assert scanner.feed("*/\npublic function f($a)\n") == \
+            [("\n" + "".join(lines), "f", "$a")]
+        assert scanner.chunks == [] and scanner.pending is None
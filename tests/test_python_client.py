@@ -0,0 +1,839 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import base64
+import csv
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import pytest
+import requests
+from .stand_in import StandInServer, load_client_module, \
+    load_extras_module
+
+
+class TestPythonClient(object):
+
+    def test_connection_reuse(self):
+        lsrc2client = load_client_module()
+        with StandInServer({"list_surveys": lambda key, user: [key, user]}) \
+                as server, lsrc2client.LimeSurveyClient(server.url) as client:
+            for i in range(20):
+                assert client.list_surveys("key", i) == ["key", i]
+            assert server.connections == 1
+
+            # threads share the pool, at most pool_size connections are used
+            def calls():
+                for i in range(10):
+                    client.list_surveys("key", i)
+            threads = [threading.Thread(target=calls) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert len(server.requests) == 60
+            assert server.connections <= 5
+
+    def test_timeout(self):
+        lsrc2client = load_client_module()
+        with StandInServer({"list_surveys":
+                            lambda key, user: time.sleep(0.5)}) as server, \
+                lsrc2client.LimeSurveyClient(server.url,
+                                             timeout=0.1) as client:
+            with pytest.raises(requests.Timeout):
+                client.list_surveys("key")
+
+    def test_codec(self):
+        """
+        Every call serializes the request and decodes the response once with
+        the codec of the client.
+        :return:
+        """
+        lsrc2client = load_client_module()
+
+        class CountingCodec(lsrc2client.JsonCodec):
+            def __init__(self):
+                self.calls = []
+
+            def dumps(self, data):
+                self.calls.append("dumps")
+                return lsrc2client.JsonCodec.dumps(self, data)
+
+            def loads(self, content):
+                self.calls.append("loads")
+                return lsrc2client.JsonCodec.loads(self, content)
+
+        codec = CountingCodec()
+        with StandInServer({"list_surveys": lambda key, user: {"ä": user}}) \
+                as server, lsrc2client.LimeSurveyClient(
+                    server.url, codec=codec) as client:
+            assert client.list_surveys("key", "ü") == {"ä": "ü"}
+            assert codec.calls == ["dumps", "loads"]
+
+    def test_orjson_codec(self):
+        lsrc2client = load_client_module()
+        pytest.importorskip("orjson")
+        assert type(lsrc2client.get_default_codec()) == \
+            lsrc2client.OrjsonCodec
+        codec = lsrc2client.OrjsonCodec()
+        data = lsrc2client.OrderedDict([("b", {1: "ä"}), ("a", None)])
+        assert codec.dumps(data) == '{"b":{"1":"ä"},"a":null}'.encode("utf-8")
+        assert codec.loads(codec.dumps(data)) == \
+            lsrc2client.JsonCodec().loads(lsrc2client.JsonCodec().dumps(data))
+
+    def test_batch(self):
+        lsrc2client = load_client_module()
+        for batch in (True, False):
+            with StandInServer({"list_surveys": lambda key, user: [key, user]},
+                               batch=batch) as server, \
+                    lsrc2client.LimeSurveyClient(server.url) as client:
+                for n in range(2):
+                    sent = len(server.requests)
+                    with client.batch() as b:
+                        futures = [b.list_surveys("key", i)
+                                   for i in range(20)]
+                        assert len(server.requests) == sent
+                    assert [f.result(5) for f in futures] == \
+                        [["key", i] for i in range(20)]
+                assert client.batch_supported is batch
+                if batch:
+                    assert len(server.requests) == 2
+                    assert len(server.requests[0]) == 20
+                else:
+                    # one rejected batch, then single requests only
+                    assert len(server.requests) == 41
+                ids = [r["id"] for r in server.requests
+                       if isinstance(r, dict)]
+                assert len(set(ids)) == len(ids)
+                # calls outside of the batch are sent right away
+                assert client.list_surveys("key") == ["key", None]
+
+    def test_batch_correlation(self):
+        """
+        Results are mapped by request id, not by the order of the responses.
+        """
+        lsrc2client = load_client_module()
+
+        class ReversingServer(StandInServer):
+            def respond(self, request):
+                response = StandInServer.respond(self, request)
+                if isinstance(response, list):
+                    response.reverse()
+                    response.pop(0)
+                return response
+
+        with ReversingServer({"list_surveys": lambda key, user: user}) \
+                as server, lsrc2client.LimeSurveyClient(server.url) as client:
+            with client.batch() as b:
+                futures = [b.list_surveys("key", i) for i in range(5)]
+            assert [f.result() for f in futures[:4]] == list(range(4))
+            with pytest.raises(lsrc2client.LimeSurveyError):
+                futures[4].result()
+
+    def test_batch_failure(self):
+        """
+        Calls of a batch failing for another reason than a JSON-RPC error are
+        not repeated as single requests.
+        """
+        lsrc2client = load_client_module()
+
+        class FailingServer(StandInServer):
+            def respond(self, request):
+                if isinstance(request, list):
+                    return 502, b"Bad Gateway"
+                return StandInServer.respond(self, request)
+
+        with FailingServer({"add_participants": lambda *args: "OK"}) \
+                as server, lsrc2client.LimeSurveyClient(server.url) as client:
+            with client.batch() as b:
+                futures = [b.add_participants("key", 1, [{"email": i}])
+                           for i in range(3)]
+            for future in futures:
+                with pytest.raises(lsrc2client.LimeSurveyError):
+                    future.result(5)
+            assert client.batch_supported is None
+            assert len(server.requests) == 1
+
+    def test_map(self):
+        lsrc2client = load_client_module()
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        def get_participant_properties(key, survey, token, properties):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.01 * (token % 3))
+            with lock:
+                in_flight[0] -= 1
+            if token == 7:
+                return {"status": "Error: Invalid tokenid"}
+            return {"tid": token}
+
+        class FailingServer(StandInServer):
+            def respond(self, request):
+                if request["params"]["$aTokenQueryProperties"] == 13:
+                    return 500, b""
+                return StandInServer.respond(self, request)
+
+        with FailingServer({"get_participant_properties":
+                            get_participant_properties}) as server, \
+                lsrc2client.LimeSurveyClient(server.url) as client:
+            results = list(client.map(
+                "get_participant_properties",
+                (("key", 1, token, None) for token in range(30)), workers=4))
+            assert len(results) == 30
+            assert results[7] == {"status": "Error: Invalid tokenid"}
+            assert isinstance(results[13], lsrc2client.LimeSurveyError)
+            assert [r["tid"] for i, r in enumerate(results)
+                    if i not in (7, 13)] == \
+                [i for i in range(30) if i not in (7, 13)]
+            assert 1 < in_flight[1] <= 4
+
+            results = list(client.map(
+                "get_participant_properties",
+                [{"session_key": "key", "survey_id": 1,
+                  "token_query_properties": token}
+                 for token in range(10)], ordered=False))
+            assert sorted(index for index, result in results) == \
+                list(range(10))
+            assert all(result == {"tid": index} or index == 7
+                       for index, result in results)
+
+    def test_async_client(self):
+        pytest.importorskip("aiohttp")
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        def list_surveys(key, user):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return [key, user]
+
+        for compact in (False, True):
+            lsrc2client = load_client_module(compact, asynchronous=True)
+            # the methods of the compact client return the coroutine
+            assert compact or asyncio.iscoroutinefunction(
+                lsrc2client.AsyncLimeSurveyClient.list_surveys)
+
+            async def calls(url):
+                async with lsrc2client.AsyncLimeSurveyClient(
+                        url, pool_size=4) as client:
+                    return await asyncio.gather(
+                        *[client.list_surveys("key", i) for i in range(20)])
+
+            with StandInServer({"list_surveys": list_surveys}) as server:
+                assert asyncio.run(calls(server.url)) == \
+                    [["key", i] for i in range(20)]
+                assert 1 < in_flight[1] <= 4
+                assert server.connections <= 4
+
+                # a client created outside of the event loop works in every
+                # loop it is used in until it is closed
+                client = lsrc2client.AsyncLimeSurveyClient(server.url)
+
+                async def call():
+                    try:
+                        return await client.list_surveys("key", 1)
+                    finally:
+                        await client.close()
+                assert asyncio.run(call()) == ["key", 1]
+                assert asyncio.run(call()) == ["key", 1]
+
+    def test_session_key(self, tmpdir):
+        lsrc2client = load_client_module()
+        keys = []
+
+        def get_session_key(username, password):
+            if password != "secret":
+                return {"status": "Invalid user name or password"}
+            keys.append("key%d" % len(keys))
+            return keys[-1]
+
+        def list_surveys(key, user):
+            if key != keys[-1]:
+                return {"status": "Invalid session key"}
+            return [key, user]
+
+        def release_session_key(key):
+            keys.append("released")
+            return "OK"
+
+        path = str(tmpdir.join("session_keys.json"))
+        with StandInServer({"get_session_key": get_session_key,
+                            "list_surveys": list_surveys,
+                            "release_session_key": release_session_key}) \
+                as server:
+            clients = [lsrc2client.LimeSurveyClient(
+                server.url, username="admin", password="secret",
+                session_cache=path) for i in range(2)]
+            # both clients use the key of the first login
+            assert clients[0].auto.list_surveys() == ["key0", None]
+            assert clients[1].auto.list_surveys("admin") == ["key0", "admin"]
+            assert clients[1].list_surveys(None) == ["key0", None]
+            assert keys == ["key0"]
+            # explicit keys are passed through
+            assert clients[0].list_surveys("other") == \
+                {"status": "Invalid session key"}
+
+            # the server forgets the key: the first client logs in again and
+            # the second one takes the new key from the cache
+            keys.append("expired")
+            assert clients[0].auto.list_surveys() == ["key2", None]
+            assert clients[1].auto.list_surveys() == ["key2", None]
+            assert keys == ["key0", "expired", "key2"]
+
+            clients[0].logout()
+            assert keys[-1] == "released"
+            assert lsrc2client.SessionKeyCache(path).get(
+                clients[0].get_session_name()) is None
+
+            client = lsrc2client.LimeSurveyClient(
+                server.url, username="admin", password="wrong")
+            with pytest.raises(lsrc2client.LimeSurveyError):
+                client.auto.list_surveys()
+            for client in clients + [client]:
+                client.close()
+
+    def test_iter_participants(self):
+        lsrc2client = load_client_module()
+        participants = {1: [{"tid": i, "token": "t%d" % i}
+                            for i in range(2345)], 2: []}
+        limits = []
+
+        def list_participants(key, survey, start, limit, unused, attributes,
+                              conditions):
+            if survey not in participants:
+                return {"status": "Error: Invalid survey ID"}
+            limits.append(limit)
+            page = participants[survey][start:start + limit]
+            return page or {"status": "No survey participants found."}
+
+        with StandInServer({"list_participants": list_participants}) \
+                as server, lsrc2client.LimeSurveyClient(server.url) as client:
+            assert list(client.iter_participants(
+                1, session_key="key", page_size=100, prefetch=2)) == \
+                participants[1]
+            # fast local calls: the page size grows up to twice per page
+            assert limits[:3] == [100, 100, 100]
+            assert 100 < max(limits) <= 10000
+
+            assert list(client.iter_participants(2, session_key="key")) == []
+            with pytest.raises(lsrc2client.LimeSurveyError):
+                list(client.iter_participants(3, session_key="key"))
+
+            # stopping early
+            participants_iter = client.iter_participants(1, session_key="key")
+            assert next(participants_iter) == participants[1][0]
+            participants_iter.close()
+
+    def test_iter_responses(self):
+        lsrc2client = load_client_module()
+        # response ids with gaps of deleted responses
+        responses = [{"id": str(i), "token": "t%d" % (i % 10), "q1": "ä%d" % i}
+                     for i in range(1, 2600) if i % 7]
+        exports = []
+
+        def encode(rows, document_type):
+            if document_type == "json":
+                data = json.dumps({"responses": [{row["id"]: row}
+                                                 for row in rows]})
+            else:
+                f = io.StringIO()
+                writer = csv.DictWriter(f, ["id", "token", "q1"])
+                writer.writeheader()
+                writer.writerows(rows)
+                data = f.getvalue()
+            return base64.b64encode(data.encode("utf-8")).decode("ascii")
+
+        def export_responses(key, survey, document_type, language, status,
+                             heading, response_type, first, last, fields):
+            exports.append((first, last, fields))
+            if survey != 1:
+                return {"status": "No Data, could not get max id."}
+            rows = [dict((k, v) for k, v in row.items()
+                         if fields is None or k in fields)
+                    for row in responses
+                    if (first or 1) <= int(row["id"]) <= (last or 10 ** 9)]
+            return encode(rows, document_type)
+
+        def export_responses_by_token(key, survey, document_type, token,
+                                      language, status, heading,
+                                      response_type, fields):
+            return encode([r for r in responses if r["token"] == token],
+                          document_type)
+
+        with StandInServer({"export_responses": export_responses,
+                            "export_responses_by_token":
+                                export_responses_by_token}) as server, \
+                lsrc2client.LimeSurveyClient(server.url) as client:
+            for document_type in ("json", "csv"):
+                del exports[:]
+                assert list(client.iter_responses(
+                    1, document_type, session_key="key",
+                    range_size=500)) == responses
+                # the id column, then ranges of 500 responses
+                assert exports[0] == (None, None, ["id"])
+                assert len(exports) == 1 + 5
+                assert sorted(exports[1:])[0] == (1, 583, None)
+
+            del exports[:]
+            assert list(client.iter_responses(
+                1, session_key="key", from_response_id=100,
+                to_response_id=1000, range_size=300)) == \
+                [r for r in responses if 100 <= int(r["id"]) <= 1000]
+            assert sorted(exports) == [(100, 399, None), (400, 699, None),
+                                       (700, 1000, None)]
+
+            assert list(client.iter_responses(
+                1, "csv", token="t3", session_key="key")) == \
+                [r for r in responses if r["token"] == "t3"]
+            assert list(client.iter_responses(2, session_key="key")) == []
+
+    def test_base64_reader(self):
+        lsrc2client = load_client_module()
+        data = bytes(range(256)) * 10
+        text = base64.encodebytes(data).decode("ascii")
+        for size in (1, 3, 5, 64, 4096):
+            reader = lsrc2client.Base64Reader(text)
+            chunks = iter(lambda: reader.read(size), b"")
+            assert b"".join(chunks) == data
+
+    def test_response_sync(self, tmpdir):
+        lsrc2client = load_client_module()
+        lsrc2extras = load_extras_module()
+        responses = [{"id": str(i), "submitdate": "2020-01-01 00:00:00",
+                      "datestamp": "2020-01-01 00:00:00", "q1": "a%d" % i}
+                     for i in range(1, 120)]
+        responses[-1]["submitdate"] = None
+        calls = []
+
+        def get_summary(key, survey, stat):
+            calls.append("get_summary")
+            if survey == 2:
+                # survey without responses and tokens table
+                return []
+            return {"full_responses": str(len(responses)),
+                    "completed_responses": str(len(
+                        [r for r in responses if r["submitdate"]]))}
+
+        def export_responses(key, survey, document_type, language, status,
+                             heading, response_type, first, last, fields):
+            calls.append(("export_responses", first, last, fields))
+            rows = [dict((k, v) for k, v in r.items()
+                         if fields is None or k in fields)
+                    for r in responses
+                    if (first or 1) <= int(r["id"]) <= (last or 10 ** 9)]
+            return base64.b64encode(json.dumps(
+                {"responses": [{r["id"]: r} for r in rows]}).encode(
+                "utf-8")).decode("ascii")
+
+        def stored(sync):
+            return [json.loads(data) for data, in sync.db.execute(
+                "SELECT data FROM responses ORDER BY id")]
+
+        path = str(tmpdir.join("responses.sqlite"))
+        with StandInServer({"get_summary": get_summary,
+                            "export_responses": export_responses}) \
+                as server, lsrc2client.LimeSurveyClient(server.url) as client:
+            with lsrc2extras.ResponseSync(client, path, "key",
+                                          batch_size=50) as sync:
+                assert sync.sync(2) == 0
+                assert sync.sync(1) == 119
+                assert stored(sync) == responses
+
+            with lsrc2extras.ResponseSync(client, path, "key") as sync:
+                # unchanged: a single call
+                del calls[:]
+                assert sync.sync(1) == 0
+                assert calls == ["get_summary"]
+
+                # only the new responses are exported
+                responses.extend({"id": str(i), "submitdate": None,
+                                  "datestamp": None, "q1": "b"}
+                                 for i in range(130, 135))
+                del calls[:]
+                assert sync.sync(1) == 5
+                assert calls[1] == ("export_responses", 120, None, ["id"])
+                assert stored(sync) == responses
+
+                # a completed response is exported again
+                responses[-3]["submitdate"] = "2020-02-01 00:00:00"
+                del calls[:]
+                assert sync.sync(1) == 6
+                assert calls[1] == ("export_responses", 119, None, ["id"])
+                assert stored(sync) == responses
+
+            # responses with a recent datestamp are exported again
+            with lsrc2extras.ResponseSync(client, path, "key",
+                                          recheck_seconds=3600) as sync:
+                assert sync.sync(1) == 0
+                sync.db.execute(
+                    "UPDATE responses SET datestamp = ? WHERE id = 100",
+                    (time.strftime("%Y-%m-%d %H:%M:%S"),))
+                responses[99]["q1"] = "changed"
+                assert sync.sync(1) == 25
+                assert stored(sync) == responses
+
+    def test_result_cache(self):
+        lsrc2client = load_client_module()
+        lsrc2extras = load_extras_module()
+        questions = {"11": {"qid": "11", "gid": "5", "sid": "1",
+                            "title": "q1"}}
+        surveys = [1, 2]
+
+        def set_question_properties(key, question, data, language):
+            questions[str(question)].update(data)
+            return {"title": True}
+
+        with StandInServer({
+                "list_questions": lambda key, survey, group, language:
+                    list(questions.values()),
+                "get_question_properties":
+                    lambda key, question, settings, language:
+                    questions[str(question)],
+                "set_question_properties": set_question_properties,
+                "get_survey_properties":
+                    lambda key, survey, settings: {"sid": survey},
+                "get_summary": lambda key, survey, stat: {"full": "1"},
+                "import_survey": lambda *args: 2,
+                "list_surveys": lambda key, user: list(surveys),
+                "delete_survey": lambda key, survey:
+                    surveys.remove(survey)}) as server, \
+                lsrc2client.LimeSurveyClient(
+                    server.url, cache=lsrc2extras.ResultCache(
+                        max_size=3, ttl=60)) as client:
+            def calls():
+                with server.lock:
+                    count = len(server.requests)
+                    del server.requests[:]
+                return count
+
+            # cached by method and parameters, not by session key
+            assert client.list_questions("a", 1)[0]["title"] == "q1"
+            assert client.list_questions("b", 1)[0]["title"] == "q1"
+            assert client.get_question_properties("a", 11)["title"] == "q1"
+            assert client.get_survey_properties("a", 1)["sid"] == 1
+            assert client.get_survey_properties("a", 2)["sid"] == 2
+            assert calls() == 4
+            # cached results are copies
+            client.get_survey_properties("a", 2)["sid"] = 3
+            assert client.get_survey_properties("a", 2)["sid"] == 2
+            # volatile methods are not cached
+            client.get_summary("a", 1)
+            client.get_summary("a", 1)
+            assert calls() == 2
+
+            # the survey of question 11 is known from list_questions: the
+            # write invalidates the question and survey 1, but not survey 2
+            client.set_question_properties("a", 11, {"title": "q2"})
+            assert client.list_questions("a", 1)[0]["title"] == "q2"
+            assert client.get_question_properties("a", 11)["title"] == "q2"
+            assert client.get_survey_properties("a", 2)["sid"] == 2
+            assert calls() == 3
+            # at most max_size entries, least recently used first out
+            assert client.get_survey_properties("a", 1)["sid"] == 1
+            assert calls() == 1
+            client.list_questions("a", 1)
+            assert calls() == 1
+
+            # a write without object clears the cache
+            client.import_survey("a", "data", "lss")
+            client.get_survey_properties("a", 2)
+            assert calls() == 2
+            # writes in a batch invalidate when they are done
+            with client.batch() as b:
+                b.set_question_properties("a", 11, {"title": "q3"})
+            assert client.list_questions("a", 1)[0]["title"] == "q3"
+            assert client.get_survey_properties("a", 2)["sid"] == 2
+            assert calls() == 2
+
+            # reads of no particular object are removed by every write
+            assert client.list_surveys("a") == [1, 2]
+            assert client.list_surveys("a") == [1, 2]
+            client.delete_survey("a", 2)
+            assert client.list_surveys("a") == [1]
+            assert calls() == 3
+
+    def test_bulk(self):
+        lsrc2client = load_client_module()
+        tokens = {}
+
+        def add_participants(key, survey, participants, create_token):
+            if any(p["email"] == "fail" for p in participants):
+                return {"status": "No permission"}
+            result = []
+            for participant in participants:
+                if not participant["email"]:
+                    result.append(dict(participant, errors={"email": "!"}))
+                    continue
+                tid = len(tokens) + 1
+                tokens[tid] = participant
+                result.append(dict(participant, tid=tid))
+            return result
+
+        def delete_participants(key, survey, token_ids):
+            return dict((tid, "Deleted" if tokens.pop(tid, None)
+                         else "Invalid token ID") for tid in token_ids)
+
+        def add_response(key, survey, response):
+            if "bad" in response:
+                return {"status": "Unable to add response"}
+            return len(response["q1"])
+
+        with StandInServer({
+                "add_participants": add_participants,
+                "delete_participants": delete_participants,
+                "cpd_importParticipants": lambda key, participants: {
+                    "ImportCount": len(participants), "UpdateCount": 0},
+                "add_response": add_response}) as server, \
+                lsrc2client.LimeSurveyClient(server.url) as client:
+            participants = [{"email": "%d@example.org" % i}
+                            for i in range(95)]
+            participants[7]["email"] = ""
+            participants[42]["email"] = "fail"
+            result = client.bulk("add_participants", participants,
+                                 chunk_size=10, workers=3, session_key="key",
+                                 survey_id=1, create_token=True)
+            requests_sent = [r for r in server.requests
+                             if r["method"] == "add_participants"]
+            assert len(requests_sent) == 10
+            # the failed chunk and the item with errors are reported
+            assert sorted(result.errors) == [7] + list(range(40, 50))
+            assert result.failed_items[0] == participants[7]
+            assert result.errors[40] == {"status": "No permission"}
+            assert [r["email"] for r in result.results if r and "tid" in r] \
+                == [p["email"] for i, p in enumerate(participants)
+                    if i != 7 and not 40 <= i < 50]
+
+            # chunks are limited by the size of the serialized items
+            del server.requests[:]
+            token_ids = sorted(tokens) + [1000]
+            result = client.bulk("delete_participants", token_ids,
+                                 chunk_bytes=20, session_key="key",
+                                 survey_id=1)
+            assert all(sum(len(str(t)) for t in r["params"]["$aTokenIDs"])
+                       <= 20 for r in server.requests)
+            assert len(server.requests) == 9
+            assert result.results[:-1] == ["Deleted"] * (len(token_ids) - 1)
+            assert list(result.errors.items()) == \
+                [(len(token_ids) - 1, "Invalid token ID")]
+
+            result = client.bulk("cpd_importParticipants", participants,
+                                 chunk_size=30, session_key="key")
+            assert result.counts == {"ImportCount": 95, "UpdateCount": 0}
+            assert not result.errors
+
+            responses = [{"q1": "a" * i} for i in range(1, 8)]
+            responses[3]["bad"] = True
+            result = client.bulk("add_response", responses, chunk_size=3,
+                                 session_key="key", survey_id=1)
+            assert result.results == [1, 2, 3, {"status":
+                                      "Unable to add response"}, 5, 6, 7]
+            assert list(result.errors) == [3]
+
+    def test_limiter(self):
+        lsrc2client = load_client_module()
+        lsrc2extras = load_extras_module()
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        def list_surveys(key, user):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            return []
+
+        # no decrease for the latencies of a busy test machine
+        limiter = lsrc2extras.ConcurrencyLimiter(initial=2, maximum=3,
+                                                 latency_factor=100)
+        with StandInServer({"list_surveys": list_surveys}) as server, \
+                lsrc2client.LimeSurveyClient(server.url,
+                                             limiter=limiter) as client:
+            assert list(client.map("list_surveys",
+                                   [("key",)] * 60, workers=10)) == [[]] * 60
+        # the limit grew, but was never exceeded
+        assert in_flight[1] == 3
+        assert limiter.limit == 3
+        assert limiter.in_flight == 0
+
+        # failures cut the limit once per round of calls in flight
+        starts = [limiter.acquire(), limiter.acquire()]
+        limiter.release(starts[0], failed=True)
+        limiter.release(starts[1], failed=True)
+        assert limiter.limit == 1.5
+        limiter.release(limiter.acquire(), failed=True)
+        assert limiter.limit == 1
+
+    def test_retries(self):
+        lsrc2client = load_client_module()
+        server = StandInServer({"list_surveys": lambda key, user: [],
+                                "add_group": lambda *args: 1})
+        failures = [2]
+
+        def respond(request):
+            if failures[0]:
+                failures[0] -= 1
+                return 503, b"Service Unavailable"
+            return StandInServer.respond(server, request)
+        server.respond = respond
+        with server, lsrc2client.LimeSurveyClient(
+                server.url, retries=2, backoff=0.01) as client:
+            # reads are repeated after temporary errors
+            assert client.list_surveys("key") == []
+            assert len(server.requests) == 3
+            failures[0] = 3
+            with pytest.raises(lsrc2client.LimeSurveyError):
+                client.list_surveys("key")
+            # writes are not
+            failures[0] = 1
+            with pytest.raises(lsrc2client.LimeSurveyError):
+                client.add_group("key", 1, "group", "")
+            assert client.add_group("key", 1, "group", "") == 1
+            assert len(server.requests) == 8
+
+    def test_metrics(self):
+        lsrc2client = load_client_module()
+        lsrc2extras = load_extras_module()
+        metrics = lsrc2extras.ClientMetrics()
+        before = []
+        with StandInServer({"list_surveys": lambda key, user: [{"sid": 1}],
+                            "list_users": lambda key, uid: 1 / 0}) \
+                as server, \
+                lsrc2client.LimeSurveyClient(server.url) as client:
+            client.add_hooks(before=lambda stats: before.append(stats.method),
+                             after=metrics.record)
+            client.list_surveys("key")
+            client.list_surveys("key")
+            with pytest.raises(requests.ConnectionError):
+                client.list_users("key")
+            with client.batch() as b:
+                b.list_surveys("key")
+            client.remove_hooks(before=client.hooks[0][0],
+                                after=metrics.record)
+            assert client.hooks == []
+            client.list_surveys("key")
+
+        assert before == ["list_surveys", "list_surveys", "list_users",
+                          "batch"]
+        data = metrics.to_dict()
+        assert list(data) == ["batch", "list_surveys", "list_users"]
+        surveys = data["list_surveys"]
+        assert surveys["calls"] == 2 and surveys["errors"] == 0
+        assert surveys["request_bytes"] > 0 and surveys["response_bytes"] > 0
+        assert surveys["encode_seconds"] + surveys["decode_seconds"] < \
+            surveys["seconds"]
+        assert sum(surveys["buckets"]) == 2
+        assert data["list_users"]["errors"] == 1
+
+        text = metrics.to_prometheus()
+        assert 'lsrc2_calls_total{method="list_surveys"} 2\n' in text
+        assert 'lsrc2_errors_total{method="list_users"} 1\n' in text
+        assert 'lsrc2_request_seconds_bucket{method="batch",le="+Inf"} 1\n' \
+            in text
+        assert 'lsrc2_request_seconds_count{method="list_surveys"} 2\n' \
+            in text
+        assert "# TYPE lsrc2_request_seconds histogram\n" in text
+
+    def test_download(self, tmpdir):
+        lsrc2client = load_client_module()
+        data = [bytes(range(256)) * 4000, b"second", b""]
+
+        def get_uploaded_files(key, survey, token):
+            if token != "t1":
+                return {"status": "Could not find response for given token"}
+            return dict(("fu_%d" % i, {
+                "meta": {"name": "a.pdf" if i < 2 else "../b.pdf"},
+                "content": base64.b64encode(d).decode("ascii")})
+                for i, d in enumerate(data))
+
+        def export_statistics(key, survey, doc_type, language, graph,
+                              group_ids):
+            if survey != 1:
+                return {"status": "No available data"}
+            return base64.b64encode(data[0]).decode("ascii")
+
+        server = StandInServer({"get_uploaded_files": get_uploaded_files,
+                                "export_statistics": export_statistics})
+
+        def respond(request):
+            # like PHP's json_encode
+            return 200, json.dumps(StandInServer.respond(
+                server, request)).replace("/", "\\/").encode("utf-8")
+        server.respond = respond
+        with server, lsrc2client.LimeSurveyClient(server.url) as client:
+            files = client.download_uploaded_files(
+                1, "t1", str(tmpdir), session_key="key", chunk_size=1000)
+            assert [(os.path.basename(f["path"]), f["size"], f["sha256"],
+                     f["meta"]["name"]) for f in files] == [
+                ("a.pdf", len(data[0]), hashlib.sha256(data[0]).hexdigest(),
+                 "a.pdf"),
+                ("fu_1_a.pdf", 6, hashlib.sha256(data[1]).hexdigest(),
+                 "a.pdf"),
+                ("b.pdf", 0, hashlib.sha256(b"").hexdigest(), "../b.pdf")]
+            for f, d in zip(files, data):
+                assert open(f["path"], "rb").read() == d
+            with pytest.raises(lsrc2client.LimeSurveyError):
+                client.download_uploaded_files(1, "t2", str(tmpdir), "key")
+            # a response failing within a file leaves no files behind
+            server.respond = lambda request: (
+                200, respond(request)[1][:len(data[0])])
+            with pytest.raises(ValueError):
+                client.download_uploaded_files(1, "t1", str(tmpdir), "key")
+            server.respond = respond
+
+            path = str(tmpdir.join("statistics.pdf"))
+            result = client.export_statistics_to(path, 1, session_key="key")
+            assert result == {"path": path, "size": len(data[0]),
+                              "sha256": hashlib.sha256(data[0]).hexdigest()}
+            assert open(path, "rb").read() == data[0]
+            with pytest.raises(lsrc2client.LimeSurveyError):
+                client.export_statistics_to(path, 2, session_key="key")
+            assert open(path, "rb").read() == data[0]
+        assert sorted(os.listdir(str(tmpdir))) == [
+            "a.pdf", "b.pdf", "fu_1_a.pdf", "statistics.pdf"]
+
+    def test_json_stream_parser(self):
+        lsrc2client = load_client_module()
+        value = {"a": [1, -2.5, True, None, {}, []],
+                 "b\"": "xé\U0001F600\\/y" * 20, "c": {"d": ["", "e"]}}
+        text = json.dumps(value, indent=1).replace("/", "\\/")
+        for size in (1, 2, 5, 13):
+            chunks = [text[i:i + size] for i in range(0, len(text), size)]
+            assert lsrc2client.JsonStreamParser(chunks).parse() == value
+
+    def test_import_file(self, tmpdir):
+        lsrc2client = load_client_module()
+        data = bytes(range(256)) * 3001
+        path = tmpdir.join("survey.lsa")
+        path.write_binary(data)
+        imported = []
+
+        def import_group(key, survey, import_data, data_type, name,
+                         description):
+            imported.append((key, survey, base64.b64decode(import_data),
+                             data_type, name, description))
+            return 7
+
+        with StandInServer({"import_group": import_group}) as server, \
+                lsrc2client.LimeSurveyClient(server.url) as client:
+            for compress in (False, True):
+                assert client.import_file(
+                    "import_group", str(path), "key", 1,
+                    new_group_name="group", compress=compress,
+                    chunk_size=1000) == 7
+        assert imported == [("key", 1, data, "lsa", "group", None)] * 2
+        # chunk_size is rounded to whole base64 blocks
+        chunks = list(lsrc2client.LimeSurveyClient.iter_import_body(
+            b"{", str(path), b"}", 999, False))
+        assert len(chunks) == len(data) // 999 + 3
+        assert base64.b64decode(b"".join(chunks)[2:-2]) == data
@@ -1,4 +1,8 @@
 # -*- coding: utf-8 -*-
+import importlib.util
+import inspect
+import os
+import pytest
 from .context import limesurveyrc2parser as pkg
 
 SourceGenerator = pkg.LimeSurveyRc2PythonSourceGenerator
@@ -62,4 +66,120 @@ class TestPythonGenerate(object):
  :param attribute_fields:  An array of integer describing any additional attribute fields
  :return: array Status=>OK when successful, otherwise the error description
  \"\"\""""
-        assert expected == result
\ No newline at end of file
+        assert expected == result
+
+    def test_get_fct_doc_name_prefix(self):
+        """
+        A parameter name is not replaced inside a longer name, and the
+        @access line is removed from the end of the doc as well.
+        :return:
+        """
+        doc = """Returns $iSurveyIDs for $iSurveyID
+@param int $iSurveyID ID of the Survey
+@param array $iSurveyIDs IDs
+@access public"""
+        parameters = [
+            {"name": "$iSurveyID", "py_name": "survey_id", "type": "i"},
+            {"name": "$iSurveyIDs", "py_name": "survey_ids", "type": "i"}]
+        result = SourceGenerator.get_fct_doc(doc=doc, parameters=parameters,
+                                             indent=0)
+        expected = '''"""
+Returns survey_ids for survey_id
+:type survey_id: Integer
+:param survey_id: ID of the Survey
+@param array survey_ids IDs
+"""'''
+        assert expected == result
+
+    def test_get_method_kind(self):
+        assert SourceGenerator.get_method_kind("list_questions") == "read"
+        assert SourceGenerator.get_method_kind("get_session_key") is None
+        assert SourceGenerator.get_method_kind("set_group_properties") == \
+            "write"
+        assert SourceGenerator.get_method_kind("copy_survey") == "write"
+        assert SourceGenerator.get_method_kind("export_responses") is None
+        source = SourceGenerator.get_method_kinds(
+            ["export_responses", "list_groups", "delete_group"])
+        assert "'delete_group': 'write'," in source
+        assert "'list_groups': 'read'," in source
+        assert "export_responses" not in source
+
+    def test_generate_to(self, tmpdir):
+        with open('resource/lsrc2source.php') as f:
+            php_source = f.read()
+        parse_result = pkg.LimeSurveyRc2PhpSourceParser.parse(php_source)
+        path = tmpdir.join("lsrc2client.py")
+        umask = os.umask(0o027)
+        try:
+            SourceGenerator.generate_to(str(path), parse_result)
+        finally:
+            os.umask(umask)
+        assert path.read() == SourceGenerator.generate(parse_result)
+        # a new file gets the mode restricted by the umask
+        assert os.stat(str(path)).st_mode & 0o777 == 0o640
+        # the mode of a replaced file is kept
+        os.chmod(str(path), 0o604)
+        SourceGenerator.generate_to(str(path), parse_result)
+        assert os.stat(str(path)).st_mode & 0o777 == 0o604
+
+        def failing_parse_result():
+            yield parse_result[0]
+            raise ValueError("parser failed")
+        with pytest.raises(ValueError):
+            SourceGenerator.generate_to(str(path), failing_parse_result())
+        # the complete client of the first run is left untouched
+        assert path.read() == SourceGenerator.generate(parse_result)
+        assert tmpdir.listdir() == [path]
+
+    def test_generate_extras(self, tmpdir):
+        path = tmpdir.join("lsrc2extras.py")
+        SourceGenerator.generate_extras_to(str(path), "myclient")
+        source = path.read()
+        assert source == SourceGenerator.generate_extras("myclient")
+        assert "from myclient import LimeSurveyError\n" in source
+        assert "#CLIENTIMPORTPLACEHOLDER" not in source
+        compile(source, str(path), "exec")
+        # the helpers are not part of the client
+        with open('resource/lsrc2source.php') as f:
+            parse_result = pkg.LimeSurveyRc2PhpSourceParser.parse(f.read())
+        client_source = SourceGenerator.generate(parse_result)
+        for name in ("ResultCache", "ConcurrencyLimiter", "ClientMetrics",
+                     "ResponseSync"):
+            assert "class %s" % name in source
+            assert "class %s" % name not in client_source
+        assert "import sqlite3" not in client_source
+
+    def test_generate_compact(self, tmpdir):
+        """
+        The methods of the compact client send the same parameters as the
+        methods of the generated client.
+        :return:
+        """
+        parse_result = list(pkg.LimeSurveyRc2PhpSourceParser.iter_parse(
+            'resource/lsrc2source.php'))
+        clients = []
+        for module, compact in (("full", False), ("compact", True)):
+            path = str(tmpdir.join(module + ".py"))
+            SourceGenerator.generate_to(path, parse_result, compact=compact)
+            spec = importlib.util.spec_from_file_location(module, path)
+            client_module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(client_module)
+            client = client_module.LimeSurveyClient("http://localhost")
+            client.query = lambda method, params: (method, params)
+            clients.append(client)
+        full, compact = clients
+
+        assert "export_statistics" not in type(compact).__dict__
+        for args, kwargs in [(("key", 1), {}),
+                             (("key",), {"survey_id": 1, "graph": "1"}),
+                             (("key", 1, "xls", "de", "1", [1, 2]), {})]:
+            assert full.export_statistics(*args, **kwargs) == \
+                compact.export_statistics(*args, **kwargs)
+        assert inspect.getdoc(compact.export_statistics) == \
+            inspect.getdoc(full.export_statistics)
+        assert inspect.signature(compact.list_participants) == \
+            inspect.signature(full.list_participants)
+        assert "list_users" in dir(compact)
+        assert compact._RC2_METHOD_KINDS == full._RC2_METHOD_KINDS
+        with pytest.raises(AttributeError):
+            compact.no_rc2_function